@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+from app.config import settings
+from app.context import build_context
+from app.database import AsyncSessionLocal
+from app.retrieval import hybrid_search
+from app import rag
+from app.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+class BotDispatcher:
+    """
+    Runs @bot answers in the background so the websocket receive loop only
+    has to enqueue them.
+
+    - Provider calls (embedding + LLM) are blocking, so they run on a bounded
+      thread pool instead of the event loop.
+    - Each project gets at most BOT_PER_PROJECT_CONCURRENCY answers in
+      flight, so one busy room cannot starve the others.
+    - Identical questions asked in the same room while an answer is still
+      being generated share that answer instead of calling the LLM again.
+    """
+
+    def __init__(
+        self,
+        broadcast: Callable[[str, str], Awaitable[None]],
+        on_answer: Callable[[str, str, str], None],
+        max_workers: int,
+        max_pending: int,
+        per_project: int,
+    ):
+        self.broadcast = broadcast
+        self.on_answer = on_answer
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bot")
+        self.max_pending = max_pending
+        self.per_project = per_project
+        self.in_flight: dict[tuple[str, str], asyncio.Task] = {}
+        # Per-project semaphores and how many answers hold or wait on each;
+        # dropped when a project's last answer finishes so the map only
+        # holds rooms with something in flight
+        self.project_slots: dict[str, asyncio.Semaphore] = {}
+        self.project_users: dict[str, int] = {}
+
+    async def submit(self, project_id: str, sender_id: str, query: str):
+        key = (project_id, " ".join(query.split()))
+        if key in self.in_flight:
+            # Same question already being answered for this room
+            return
+
+        if len(self.in_flight) >= self.max_pending:
+            await self.broadcast("🤖 AI: I'm busy right now, please ask again in a moment.", project_id)
+            return
+
+        await self.broadcast(f"🤖 AI: Thinking about '{query}'...", project_id)
+        task = asyncio.create_task(self._answer(project_id, sender_id, query))
+        self.in_flight[key] = task
+        task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+
+    async def _answer(self, project_id: str, sender_id: str, query: str):
+        slot = self.project_slots.setdefault(project_id, asyncio.Semaphore(self.per_project))
+        self.project_users[project_id] = self.project_users.get(project_id, 0) + 1
+        try:
+            async with slot:
+                try:
+                    with timed("bot.answer"):
+                        ai_response = await self._generate(project_id, query)
+                except Exception:
+                    logger.exception("Bot answer failed for project %s", project_id)
+                    ai_response = "Sorry, I couldn't answer that right now."
+        finally:
+            self.project_users[project_id] -= 1
+            if not self.project_users[project_id]:
+                del self.project_users[project_id]
+                del self.project_slots[project_id]
+
+        self.on_answer(project_id, sender_id, ai_response)
+        await self.broadcast(f"🤖 AI: {ai_response}", project_id)
+
+    async def _generate(self, project_id: str, query: str) -> str:
+        loop = asyncio.get_running_loop()
+        query_vector = await loop.run_in_executor(self.executor, rag.embed_query, query)
+
+        async with AsyncSessionLocal() as db:
+            chunks = await hybrid_search(db, project_id, query, query_vector)
+        context = build_context(chunks, settings.BOT_CONTEXT_TOKENS)
+
+        if not context:
+            return "I couldn't find information on that in the paper."
+
+        return await loop.run_in_executor(
+            self.executor,
+            rag.generate,
+            f"Context: {context}\n\nQuestion: {query}",
+        )
+
+    def shutdown(self):
+        for task in list(self.in_flight.values()):
+            task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError, OperationalError, TimeoutError as PoolTimeoutError
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Database restarts, dropped connections and pool timeouts: the batch is
+# kept and retried instead of dropped
+TRANSIENT_ERRORS = (OperationalError, PoolTimeoutError)
+MAX_RETRY_DELAY = 5.0
+SHUTDOWN_RETRIES = 3
+
+
+class ChatMessageWriter:
+    """
+    Write-behind persistence for chat messages.
+
+    The websocket loop only enqueues rows; a single background task flushes
+    them in batches with a short-lived session, so a busy room costs one
+    INSERT per batch instead of one transaction per message.
+    """
+
+    def __init__(self, flush_interval_ms: int, batch_size: int):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue[dict] = asyncio.Queue()
+        # Rows taken off the queue but not yet written; kept here (not in a
+        # local) so stop() can still flush them if the loop is cancelled
+        self._pending: list[dict] = []
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Flush the batch the loop had in hand, then whatever is still queued
+        while self._pending or not self.queue.empty():
+            self._pending += self._drain(self.batch_size - len(self._pending))
+            for attempt in range(SHUTDOWN_RETRIES):
+                try:
+                    await self._flush(self._pending)
+                    break
+                except TRANSIENT_ERRORS:
+                    await asyncio.sleep(self.flush_interval * 2 ** attempt)
+                except Exception:
+                    break
+            else:
+                logger.error("Dropping %d chat messages at shutdown: database unavailable", len(self._pending))
+            self._pending = []
+
+    def enqueue(self, project_id, sender_id: str, content: str, is_ai: bool = False) -> dict:
+        # id and timestamp are fixed at enqueue time so history order matches
+        # the order messages were broadcast, not the order batches landed.
+        row = {
+            "id": uuid.uuid4(),
+            "project_id": uuid.UUID(str(project_id)),
+            "sender_id": sender_id,
+            "content": content,
+            "is_ai": is_ai,
+            "created_at": datetime.utcnow(),
+        }
+        self.queue.put_nowait(row)
+        return row
+
+    def _drain(self, limit: int) -> list[dict]:
+        rows = []
+        while not self.queue.empty() and len(rows) < limit:
+            rows.append(self.queue.get_nowait())
+        return rows
+
+    async def _run(self):
+        retry_delay = self.flush_interval
+        while True:
+            if not self._pending:
+                self._pending.append(await self.queue.get())
+                # Give the batch a moment to fill up before writing
+                await asyncio.sleep(self.flush_interval)
+            self._pending += self._drain(self.batch_size - len(self._pending))
+            try:
+                await self._flush(self._pending)
+            except TRANSIENT_ERRORS as e:
+                logger.warning(
+                    "Database unavailable (%s), retrying %d chat messages in %.1fs",
+                    e.__class__.__name__, len(self._pending), retry_delay,
+                )
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(MAX_RETRY_DELAY, retry_delay * 2)
+                continue
+            except Exception:
+                logger.exception("Failed to persist %d chat messages", len(self._pending))
+            retry_delay = self.flush_interval
+            self._pending = []
+
+    async def _flush(self, rows: list[dict]):
+        if not rows:
+            return
+        try:
+            await self._insert(rows)
+        except IntegrityError:
+            # One bad row (e.g. unknown sender) must not drop the whole batch
+            for row in rows:
+                try:
+                    await self._insert([row])
+                except IntegrityError:
+                    logger.warning("Dropping chat message %s: integrity error", row["id"])
+
+    async def _insert(self, rows: list[dict]):
+        # ids are fixed at enqueue time, so re-flushing a batch that did
+        # commit (e.g. cancelled right after) is a no-op, not a duplicate
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(ChatMessage).on_conflict_do_nothing(index_elements=["id"]), rows)
+            await db.commit()
+
+
+chat_writer = ChatMessageWriter(
+    flush_interval_ms=settings.CHAT_FLUSH_INTERVAL_MS,
+    batch_size=settings.CHAT_FLUSH_BATCH_SIZE,
+)
@@ -0,0 +1,89 @@
+from app.rag import CHUNK_OVERLAP, estimate_tokens
+
+# Below this many characters a suffix/prefix match is more likely chance than
+# splitter overlap
+MIN_OVERLAP = 20
+
+
+def join_overlapping(left: str, right: str, max_overlap: int = CHUNK_OVERLAP * 2) -> str:
+    """
+    Join two consecutive chunks, dropping the text the splitter repeated
+    at the end of `left` and the start of `right`.
+    """
+    for size in range(min(len(left), len(right), max_overlap), MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + " " + right
+
+
+def merge_chunks(chunks) -> list[dict]:
+    """
+    Order chunks by position in the paper and merge runs of consecutive
+    chunks from the same page into single spans.
+    Chunks without a position (ingested before it was stored) come last,
+    unmerged.
+    """
+    positioned = sorted(
+        (c for c in chunks if c.chunk_index is not None),
+        key=lambda c: c.chunk_index,
+    )
+    unpositioned = [c for c in chunks if c.chunk_index is None]
+
+    spans: list[dict] = []
+    for c in positioned:
+        last = spans[-1] if spans else None
+        if last and last["end"] == c.chunk_index - 1 and last["page"] == c.page_number:
+            last["text"] = join_overlapping(last["text"], c.content)
+            last["end"] = c.chunk_index
+        elif last and last["end"] == c.chunk_index:
+            # Same chunk retrieved twice
+            continue
+        else:
+            spans.append({
+                "page": c.page_number,
+                "start": c.chunk_index,
+                "end": c.chunk_index,
+                "text": c.content,
+            })
+
+    for c in unpositioned:
+        spans.append({"page": c.page_number, "start": None, "end": None, "text": c.content})
+
+    return spans
+
+
+def render_spans(spans: list[dict]) -> str:
+    parts = []
+    for span in spans:
+        header = f"[Page {span['page']}]\n" if span["page"] else ""
+        parts.append(header + span["text"])
+    return "\n\n".join(parts)
+
+
+def build_context(chunks, max_tokens: int) -> str:
+    """
+    Pack retrieved chunks (most relevant first) into a prompt context of at
+    most `max_tokens`, in paper order, with splitter overlap removed.
+
+    Chunks are taken greedily by relevance; a chunk that would overflow the
+    budget is skipped so a smaller, less relevant one can still fit. Merged
+    neighbours are cheaper than their sum, so the budget is checked on the
+    rendered result, not per chunk.
+    """
+    selected = []
+    context = ""
+    for chunk in chunks:
+        if not chunk.content:
+            continue
+        trial = render_spans(merge_chunks(selected + [chunk]))
+        if estimate_tokens(trial) > max_tokens:
+            continue
+        selected.append(chunk)
+        context = trial
+
+    if not selected and chunks:
+        # Even the best chunk alone is over budget; send a truncated copy
+        # rather than nothing
+        context = (chunks[0].content or "")[: max_tokens * 4]
+
+    return context
@@ -1,27 +1,38 @@
 import shutil
 import uuid
 import os
+import time
 from typing import List
 
-from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException, WebSocket, WebSocketDisconnect, Request, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import StreamingResponse
 from io import BytesIO
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, tuple_, update
 from uuid import UUID
+from datetime import datetime
+from typing import Optional
 from sqlalchemy.orm import selectinload
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.models import ProjectFile
 
-from app.database import init_db, get_db
-from app.models import Project, User, CollabRequest, ChatMessage, Embedding
-from app.schemas import ProjectOut, CollabRequestOut
+from app.database import check_schema, get_db, get_read_db
+from app.models import Project, User, CollabRequest, ChatMessage, Embedding, IngestionState
+from app.schemas import ProjectOut, CollabRequestOut, ChatMessageOut
+from app.chat_writer import chat_writer
+from app.bot import BotDispatcher
+from app.retrieval import hybrid_search, nearest, widen_hnsw_search
+from app.context import build_context
+from app.summaries import get_section_summaries
+from app.progress import apublish_progress, get_progress, single_event, stream_progress, TERMINAL_STAGES
+from app import metrics
+from app.metrics import timed
 from app.auth import router as auth_router
 from app.tasks import process_paper_task  # <--- OLD FEATURE: Import Celery Task
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from app.config import settings
+from app import rag
 
 app = FastAPI(title="ResPlanet API (Gemini Edition)")
 
@@ -39,10 +50,39 @@ app.mount("/static", StaticFiles(directory="."), name="static")
 app.include_router(auth_router)
 
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/projects/{project_id}), not the raw path
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), status
+        ).observe(time.perf_counter() - started)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
+
 
 @app.on_event("startup")
 async def startup_event():
-    await init_db()
+    await check_schema()
+    await chat_writer.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    bot.shutdown()
+    await chat_writer.stop()
 
 # class ConnectionManager:
 #     def __init__(self):
@@ -116,10 +156,65 @@ async def upload_paper(
     await db.commit()
 
     # 3. Trigger Celery (ONLY project_id)
+    await apublish_progress(project.id, stage="queued")
     process_paper_task.delay(str(project.id))
 
     return {"id": project.id, "status": "processing_started"}
 
+async def stored_status(db: AsyncSession, project_id: UUID) -> dict:
+    """
+    Ingestion status from the database, for projects with no state in Redis
+    (uploaded before progress was published there, or expired).
+    """
+    result = await db.execute(
+        select(Project.is_processed, IngestionState)
+        .outerjoin(IngestionState, IngestionState.project_id == Project.id)
+        .where(Project.id == project_id)
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    is_processed, state = row
+    if state is None:
+        return {"project_id": project_id, "stage": "done" if is_processed else "unknown"}
+    return {
+        "project_id": project_id,
+        "stage": state.stage,
+        "chunks_total": state.chunks_total,
+        "chunks_done": state.chunks_done,
+        "error": state.error,
+    }
+
+
+@app.get("/projects/{project_id}/status")
+async def get_processing_status(project_id: UUID, db: AsyncSession = Depends(get_read_db)):
+    """Ingestion progress, served from Redis; the DB only when Redis has none."""
+    state = await get_progress(project_id)
+    if not state:
+        return await stored_status(db, project_id)
+    return state
+
+
+@app.get("/projects/{project_id}/events")
+async def stream_processing_events(project_id: UUID, db: AsyncSession = Depends(get_read_db)):
+    """Server-sent ingestion progress events; the stream ends at done/failed."""
+    state = await get_progress(project_id)
+    if not state:
+        # Nothing is in flight, so nothing will be published: one event and close
+        fallback = await stored_status(db, project_id)
+        events = single_event(fallback)
+    elif state.get("stage") in TERMINAL_STAGES:
+        events = single_event(state)
+    else:
+        events = stream_progress(project_id, fallback={"project_id": project_id, "stage": "unknown"})
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/projects/{project_id}/file")
 async def get_project_file(
     project_id: UUID,
@@ -148,31 +243,19 @@ async def chat(query: str, project_id: str, db: AsyncSession = Depends(get_db)):
     OLD FEATURE: Standard HTTP RAG Chat
     """
     # 1. Embed Query
-    embeddings_model = GoogleGenerativeAIEmbeddings(
-        model="models/text-embedding-004", 
-        google_api_key=settings.GOOGLE_API_KEY
-    )
-    query_vector = embeddings_model.embed_query(query)
-    
-    # 2. Semantic Search
-    stmt = select(Embedding).filter(Embedding.project_id == project_id)\
-        .order_by(Embedding.vector.cosine_distance(query_vector))\
-        .limit(10)
+    with timed("chat.embed_query"):
+        query_vector = await rag.aembed_query(query)
     
-    result = await db.execute(stmt)
-    relevant_chunks = result.scalars().all()
+    # 2. Hybrid Search (full-text + semantic, rank-fused)
+    with timed("chat.retrieve"):
+        relevant_chunks = await hybrid_search(db, project_id, query, query_vector)
     
     if not relevant_chunks:
         return {"answer": "I couldn't find relevant info."}
     
-    context = "\n\n".join([c.content for c in relevant_chunks[:5]])
+    context = build_context(relevant_chunks, settings.CHAT_CONTEXT_TOKENS)
     
     # 3. Generate Answer
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash", 
-        google_api_key=settings.GOOGLE_API_KEY
-    )
-    
     prompt = f"""
     You are an expert research assistant.
 
@@ -187,17 +270,77 @@ async def chat(query: str, project_id: str, db: AsyncSession = Depends(get_db)):
     {query}
     """
 
-    response = llm.invoke(prompt)
+    with timed("chat.generate"):
+        answer = await rag.agenerate(prompt)
     
     return {
-        "answer": response.content,
+        "answer": answer,
         "sources": [c.content[:100] + "..." for c in relevant_chunks]
     }
 
+@app.get("/search")
+async def global_search(
+    query: str,
+    k: int = settings.SEARCH_TOP_K,
+    papers: int = settings.SEARCH_CANDIDATE_PAPERS,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Semantic search across all papers, in two stages:
+    1. pick the candidate papers whose centroid is closest (HNSW index)
+    2. rank chunks only inside those papers
+    so cost grows with the number of candidates, not the corpus.
+    """
+    # Unbounded values would turn stage 2 into a scan of the whole corpus
+    k = max(1, min(k, settings.SEARCH_TOP_K * 5))
+    papers = max(1, min(papers, settings.SEARCH_CANDIDATE_PAPERS * 5))
+
+    with timed("search.embed_query"):
+        query_vector = await rag.aembed_query(query)
+
+    # 1. Candidate papers (the centroid HNSW scan would stop at ef_search)
+    with timed("search.candidates"):
+        await widen_hnsw_search(db, papers)
+        result = await db.execute(
+            select(Project.id, Project.title)
+            .where(Project.centroid.isnot(None))
+            .order_by(Project.centroid.cosine_distance(query_vector))
+            .limit(papers)
+        )
+        candidates = {row.id: row.title for row in result}
+
+    if not candidates:
+        return {"query": query, "results": []}
+
+    # 2. Chunks inside the candidates
+    distance = Embedding.vector.cosine_distance(query_vector).label("distance")
+    with timed("search.chunks"):
+        result = await nearest(
+            db,
+            select(Embedding.project_id, Embedding.content, distance)
+            .where(Embedding.project_id.in_(list(candidates))),
+            query_vector,
+            k,
+        )
+        rows = result.all()
+
+    return {
+        "query": query,
+        "results": [
+            {
+                "project_id": row.project_id,
+                "title": candidates[row.project_id],
+                "content": row.content,
+                "score": 1 - row.distance,
+            }
+            for row in rows
+        ],
+    }
+
 ########### Feed Features ###########################
 
 @app.get("/feed", response_model=List[ProjectOut])
-async def get_feed(db: AsyncSession = Depends(get_db)):
+async def get_feed(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(
         select(Project)
         .options(selectinload(Project.user),
@@ -209,7 +352,7 @@ async def get_feed(db: AsyncSession = Depends(get_db)):
 
 
 @app.get("/feed/trending", response_model=List[ProjectOut])
-async def get_trending_feed(db: AsyncSession = Depends(get_db)):
+async def get_trending_feed(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(
         select(Project)
         .options(
@@ -226,8 +369,9 @@ async def get_trending_feed(db: AsyncSession = Depends(get_db)):
 async def get_project(
     project_id: UUID,
     db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
 ):
-    result = await db.execute(
+    result = await read_db.execute(
         select(Project)
         # .options(selectinload(Project.user)) 
         .options(
@@ -241,9 +385,16 @@ async def get_project(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # Increment view count
-    project.views_count += 1
+    # Increment view count on the primary (atomic, so concurrent views
+    # aren't lost); the read session itself is never committed
+    result = await db.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(views_count=Project.views_count + 1)
+        .returning(Project.views_count)
+    )
     await db.commit()
+    project.views_count = result.scalar_one()
 
     return project
 
@@ -264,32 +415,27 @@ async def ai_peer_review(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # 2. Fetch top relevant chunks for review
-    result = await db.execute(
-        select(Embedding)
-        .where(Embedding.project_id == project_id)
-        .limit(15)
-    )
-    chunks = result.scalars().all()
+    # 2. Map: per-section summaries over the whole paper (cached)
+    with timed("review.map"):
+        sections = await get_section_summaries(db, project_id)
 
-    if not chunks:
+    if not sections:
         raise HTTPException(
             status_code=400,
             detail="Paper is not processed yet. Please try again later."
         )
 
-    context = "\n\n".join(c.content for c in chunks[:10])
-
-    # 3. Ask AI to critique the paper
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        google_api_key=settings.GOOGLE_API_KEY
+    context = "\n\n".join(
+        f"[Section {s.section_index + 1}, pages {s.page_start}-{s.page_end}]\n{s.summary}"
+        for s in sections
     )
 
+    # 3. Reduce: ask AI to critique the paper from the section summaries
     prompt = f"""
 You are an expert academic peer reviewer.
 
-Critically review the following research paper content.
+Critically review the following research paper, given as summaries of
+its sections in reading order.
 Your review MUST include:
 
 1. Summary of the paper
@@ -303,11 +449,12 @@ Your review MUST include:
 Base your review ONLY on the content below.
 If information is missing, explicitly mention it.
 
-Paper Content:
+Section Summaries:
 {context}
 """
 
-    review = llm.invoke(prompt).content
+    with timed("review.reduce"):
+        review = await rag.agenerate(prompt)
 
     return {
         "project_id": project_id,
@@ -344,7 +491,7 @@ async def send_collab_request(
 @app.get("/collab/requests/{user_id}", response_model=List[CollabRequestOut])
 async def get_my_requests(
     user_id: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     result = await db.execute(
         select(CollabRequest)
@@ -415,62 +562,79 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+bot = BotDispatcher(
+    broadcast=manager.broadcast,
+    on_answer=lambda project_id, sender_id, answer: chat_writer.enqueue(
+        project_id, sender_id, answer, is_ai=True
+    ),
+    max_workers=settings.BOT_MAX_WORKERS,
+    max_pending=settings.BOT_MAX_PENDING,
+    per_project=settings.BOT_PER_PROJECT_CONCURRENCY,
+)
+
+@app.get("/projects/{project_id}/messages", response_model=List[ChatMessageOut])
+async def get_chat_history(
+    project_id: UUID,
+    before: Optional[datetime] = None,
+    before_id: Optional[UUID] = None,
+    limit: int = settings.CHAT_HISTORY_PAGE_SIZE,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Room history, newest first. Pass the created_at/id of the oldest message
+    you have as before/before_id to get the next page (keyset pagination on
+    ix_chat_messages_project_created, so deep pages cost the same as page 1).
+    """
+    limit = max(1, min(limit, settings.CHAT_HISTORY_PAGE_SIZE * 4))
+
+    stmt = (
+        select(ChatMessage)
+        .options(selectinload(ChatMessage.sender))
+        .where(ChatMessage.project_id == project_id)
+    )
+    if before is not None:
+        if before_id is not None:
+            stmt = stmt.where(
+                tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(before, before_id)
+            )
+        else:
+            stmt = stmt.where(ChatMessage.created_at < before)
+
+    stmt = stmt.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit)
+
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
 @app.websocket("/ws/chat/{project_id}/{sender_id}")
 async def websocket_chat(
     websocket: WebSocket, 
     project_id: str, 
     sender_id: str, 
-    db: AsyncSession = Depends(get_db)
 ):
+    try:
+        UUID(project_id)
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+
     await manager.connect(websocket, project_id)
     try:
         while True:
             data = await websocket.receive_text()
             
-            # 1. Save Human Message to DB
-            human_msg = ChatMessage(project_id=project_id, sender_id=sender_id, content=data, is_ai=False)
-            db.add(human_msg)
-            await db.commit()
+            # 1. Queue Human Message for batched persistence
+            chat_writer.enqueue(project_id, sender_id, data, is_ai=False)
             
             # 2. Broadcast to room
             await manager.broadcast(f"User {sender_id}: {data}", project_id)
 
             # 3. Check for Bot Trigger "@bot"
+            # Answered in the background; the answer is broadcast to the room
+            # when ready, so this socket keeps receiving in the meantime
             if "@bot" in data.lower():
                 query = data.lower().replace("@bot", "").strip()
-                await manager.broadcast(f"🤖 AI: Thinking about '{query}'...", project_id)
-                
-                # --- RAG LOGIC INSIDE WEBSOCKET ---
-                embeddings_model = GoogleGenerativeAIEmbeddings(
-                    model="models/text-embedding-004", 
-                    google_api_key=settings.GOOGLE_API_KEY
-                )
-                query_vector = embeddings_model.embed_query(query)
-                
-                stmt = select(Embedding).filter(Embedding.project_id == project_id)\
-                    .order_by(Embedding.vector.cosine_distance(query_vector)).limit(3)
-                
-                # Need a new session for async operation inside loop if 'db' is closed (rare in WS but safe to check)
-                # Using the injected 'db' session is usually fine for the lifecycle of the connection
-                result = await db.execute(stmt)
-                chunks = result.scalars().all()
-                context = "\n".join([c.content for c in chunks])
-                
-                if not context:
-                    ai_response = "I couldn't find information on that in the paper."
-                else:
-                    llm = ChatGoogleGenerativeAI(
-                        model="gemini-2.5-flash", 
-                        google_api_key=settings.GOOGLE_API_KEY
-                    )
-                    ai_response = llm.invoke(f"Context: {context}\n\nQuestion: {query}").content
-                
-                # Save AI Message
-                ai_msg = ChatMessage(project_id=project_id, sender_id=sender_id, content=ai_response, is_ai=True)
-                db.add(ai_msg)
-                await db.commit()
-                
-                await manager.broadcast(f"🤖 AI: {ai_response}", project_id)
+                await bot.submit(project_id, sender_id, query)
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket, project_id)
\ No newline at end of file
+        manager.disconnect(websocket, project_id)
@@ -0,0 +1,66 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Wide enough for both a pgvector lookup (ms) and a long LLM call (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "resplanet_http_request_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STAGE_SECONDS = Histogram(
+    "resplanet_stage_seconds",
+    "Latency of individual pipeline stages (embedding, search, LLM, ingestion steps)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+TASK_SECONDS = Histogram(
+    "resplanet_celery_task_seconds",
+    "Celery task run time",
+    ["task", "state"],
+    buckets=LATENCY_BUCKETS,
+)
+
+TASK_RETRIES = Counter(
+    "resplanet_celery_task_retries_total",
+    "Celery task retries",
+    ["task"],
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """Record how long the block takes under resplanet_stage_seconds{stage=...}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def registry():
+    # Prefork Celery workers write per-process files that must be aggregated
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        reg = CollectorRegistry()
+        multiprocess.MultiProcessCollector(reg)
+        return reg
+    return REGISTRY
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
@@ -10,9 +10,12 @@ from sqlalchemy import (
     Integer,
     DateTime,
     ForeignKey,
-    ARRAY
+    ARRAY,
+    UniqueConstraint,
+    Index,
+    Computed
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from sqlalchemy.orm import relationship
 from pgvector.sqlalchemy import Vector
 from sqlalchemy import LargeBinary
@@ -86,6 +89,10 @@ class Project(Base):
     # NEW: Trending support
     views_count = Column(Integer, default=0)
 
+    # Mean of the paper's chunk embeddings, used to pick candidate papers
+    # for cross-paper search before searching chunks
+    centroid = Column(Vector(768))
+
     # Relationships
     user = relationship("User", back_populates="projects")
     embeddings = relationship(
@@ -109,6 +116,28 @@ class Project(Base):
         uselist=False,
         cascade="all, delete-orphan"
     )
+    ingestion_state = relationship(
+        "IngestionState",
+        back_populates="project",
+        uselist=False,
+        cascade="all, delete-orphan"
+    )
+    section_summaries = relationship(
+        "SectionSummary",
+        back_populates="project",
+        cascade="all, delete-orphan",
+        order_by="SectionSummary.section_index"
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_projects_centroid_hnsw",
+            "centroid",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"centroid": "vector_cosine_ops"},
+        ),
+    )
 
 
 #Embedding Model
@@ -116,15 +145,71 @@ class Embedding(Base):
     __tablename__ = "embeddings"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"))
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), index=True)
 
     content = Column(Text)
 
+    # Position in the paper (1-based page, 0-based chunk order across the paper)
+    page_number = Column(Integer)
+    chunk_index = Column(Integer)
+
     # Gemini embeddings (768 dims)
     vector = Column(Vector(768))
 
+    # Full-text index over content for exact-term (lexical) retrieval
+    content_tsv = Column(
+        TSVECTOR,
+        Computed("to_tsvector('english', coalesce(content, ''))", persisted=True)
+    )
+
     project = relationship("Project", back_populates="embeddings")
 
+    __table_args__ = (
+        Index("ix_embeddings_content_tsv", "content_tsv", postgresql_using="gin"),
+        # The compact ANN index for VECTOR_SEARCH_MODE (if any) is not
+        # declared here: only the one for the configured mode is built, see
+        # COMPACT_INDEXES in app/retrieval.py and vector_index.py
+    )
+
+#Ingestion checkpoint (one row per project, see app/tasks.py)
+class IngestionState(Base):
+    __tablename__ = "ingestion_states"
+
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), primary_key=True)
+
+    # queued -> embedding -> finalizing -> done (or failed)
+    stage = Column(String, default="queued", nullable=False)
+    chunks_total = Column(Integer, default=0)
+    chunks_done = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    error = Column(Text)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    project = relationship("Project", back_populates="ingestion_state")
+
+#Section Summary (map step of the peer review, cached per paper)
+class SectionSummary(Base):
+    __tablename__ = "section_summaries"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), index=True)
+
+    section_index = Column(Integer, nullable=False)
+    chunk_start = Column(Integer)
+    chunk_end = Column(Integer)
+    page_start = Column(Integer)
+    page_end = Column(Integer)
+
+    summary = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    project = relationship("Project", back_populates="section_summaries")
+
+    __table_args__ = (
+        UniqueConstraint("project_id", "section_index", name="uq_section_summaries_project_section"),
+    )
+
 #Collaboration Request
 class RequestStatus(str, enum.Enum):
     PENDING = "PENDING"
@@ -171,3 +256,8 @@ class ChatMessage(Base):
 
     project = relationship("Project", back_populates="chat_messages")
     sender = relationship("User", back_populates="messages")
+
+    # Room history is always read newest-first per project (keyset paginated)
+    __table_args__ = (
+        Index("ix_chat_messages_project_created", "project_id", "created_at", "id"),
+    )
@@ -0,0 +1,123 @@
+import json
+import time
+
+import redis
+import redis.asyncio as aioredis
+
+from app.config import settings
+
+# Latest ingestion state per project lives in a Redis hash; every change is
+# also published on a channel so clients can be pushed updates instead of
+# polling the projects table.
+TERMINAL_STAGES = {"done", "failed"}
+# In-flight state expires (a crashed worker must not leave it forever);
+# done/failed is kept, so status stays right long after processing
+STATE_TTL = 24 * 3600
+HEARTBEAT_INTERVAL = 15
+
+_redis = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+_aredis = aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+def state_key(project_id) -> str:
+    return f"ingest:{project_id}"
+
+
+def channel(project_id) -> str:
+    return f"ingest:{project_id}:events"
+
+
+def _encode(project_id, fields: dict) -> dict:
+    values = {k: "" if v is None else v for k, v in fields.items()}
+    values["project_id"] = str(project_id)
+    values["updated_at"] = time.time()
+    return values
+
+
+# Redis hashes store strings; these are turned back into numbers so Redis
+# and the DB fallback (main.stored_status) answer with the same types
+INT_FIELDS = {"chunks_total", "chunks_done", "attempts"}
+FLOAT_FIELDS = {"updated_at"}
+
+
+def _decode(state: dict) -> dict:
+    values = {}
+    for key, value in state.items():
+        if value == "":
+            values[key] = None
+        elif key in INT_FIELDS:
+            values[key] = int(value)
+        elif key in FLOAT_FIELDS:
+            values[key] = float(value)
+        else:
+            values[key] = value
+    return values
+
+
+def _record(pipe, project_id, fields: dict):
+    key = state_key(project_id)
+    pipe.hset(key, mapping=_encode(project_id, fields))
+    if fields.get("stage") in TERMINAL_STAGES:
+        pipe.persist(key)
+    elif "stage" in fields:
+        pipe.expire(key, STATE_TTL)
+    pipe.hgetall(key)
+
+
+def publish_progress(project_id, **fields):
+    """Record and broadcast an ingestion update (sync, for Celery workers)."""
+    pipe = _redis.pipeline()
+    _record(pipe, project_id, fields)
+    state = _decode(pipe.execute()[-1])
+    _redis.publish(channel(project_id), json.dumps(state))
+
+
+async def apublish_progress(project_id, **fields):
+    """Same as publish_progress, for the API process."""
+    pipe = _aredis.pipeline()
+    _record(pipe, project_id, fields)
+    state = _decode((await pipe.execute())[-1])
+    await _aredis.publish(channel(project_id), json.dumps(state))
+
+
+async def get_progress(project_id) -> dict | None:
+    state = await _aredis.hgetall(state_key(project_id))
+    return _decode(state) if state else None
+
+
+async def single_event(state: dict):
+    """An SSE stream of one event, for states that will never change."""
+    yield f"data: {json.dumps(state, default=str)}\n\n"
+
+
+async def stream_progress(project_id, fallback: dict):
+    """
+    Server-sent events for one project's ingestion: the current state,
+    then every update until the stage is done or failed.
+    Without live state in Redis nothing will ever be published, so the
+    stream sends `fallback` (the stored status) once and ends.
+    """
+    pubsub = _aredis.pubsub()
+    # Subscribe before reading the current state so no update is missed
+    await pubsub.subscribe(channel(project_id))
+    try:
+        state = await get_progress(project_id)
+        if not state:
+            yield f"data: {json.dumps(fallback, default=str)}\n\n"
+            return
+        yield f"data: {json.dumps(state)}\n\n"
+        if state.get("stage") in TERMINAL_STAGES:
+            return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT_INTERVAL)
+            if message is None:
+                # Keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            yield f"data: {message['data']}\n\n"
+            if json.loads(message["data"]).get("stage") in TERMINAL_STAGES:
+                return
+    finally:
+        await pubsub.unsubscribe(channel(project_id))
+        await pubsub.aclose()
@@ -1,19 +1,142 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-import os
+from functools import lru_cache
 from app.config import settings
 import io
-from PyPDF2 import PdfReader
-from langchain_core.documents import Document
-
-
-
-
-embeddings_model = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=settings.GOOGLE_API_KEY)
-
-
-chat_model = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=settings.GOOGLE_API_KEY)
+import asyncio
+import time
+from app.ratelimit import ProviderLimiter, INTERACTIVE, BACKGROUND, is_rate_limited
+from app.metrics import timed
+
+# LangChain / Gemini / PDF libraries are imported on first use, not at import
+# time: they dominate API and worker startup and most processes (or code
+# paths) never need all of them.
+
+
+@lru_cache(maxsize=None)
+def get_embeddings_model():
+    if settings.MODEL_PROVIDER == "stub":
+        # Deterministic offline model for benchmarks and load tests
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=768)
+
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=settings.GOOGLE_API_KEY)
+
+
+@lru_cache(maxsize=None)
+def get_chat_model():
+    if settings.MODEL_PROVIDER == "stub":
+        from langchain_core.language_models import FakeListChatModel
+        return FakeListChatModel(responses=["transformers, attention, retrieval, benchmarks, embeddings"])
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=settings.GOOGLE_API_KEY)
+
+# Every embedding / LLM call goes through these (see call_provider)
+embed_limiter = ProviderLimiter(
+    "embedding",
+    settings.REDIS_URL,
+    rpm=settings.EMBED_RPM,
+    tpm=settings.EMBED_TPM,
+    reserve=settings.PROVIDER_INTERACTIVE_RESERVE,
+    max_concurrency=settings.PROVIDER_MAX_CONCURRENCY,
+)
+chat_limiter = ProviderLimiter(
+    "chat",
+    settings.REDIS_URL,
+    rpm=settings.CHAT_RPM,
+    tpm=settings.CHAT_TPM,
+    reserve=settings.PROVIDER_INTERACTIVE_RESERVE,
+    max_concurrency=settings.PROVIDER_MAX_CONCURRENCY,
+)
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Budgeted against the tokens/min quota for every LLM call, on top of the prompt
+EXPECTED_OUTPUT_TOKENS = 512
+
+# Provider responses that are worth retrying later
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class TransientProviderError(Exception):
+    """A model provider call failed in a way that may succeed on retry."""
+
+
+def is_transient(exc: Exception) -> bool:
+    # LangChain wraps the SDK error, so look through the whole cause chain
+    while exc is not None:
+        if isinstance(exc, (TimeoutError, ConnectionError)):
+            return True
+        code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+        if code in TRANSIENT_STATUS_CODES:
+            return True
+        if "RESOURCE_EXHAUSTED" in str(exc) or "UNAVAILABLE" in str(exc):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose; good enough for budgeting
+    return len(text) // 4 + 1
+
+
+def call_provider(limiter: ProviderLimiter, priority: str, tokens: int, fn, *args, **kwargs):
+    """
+    Call a model client through the shared rate limiter.
+    Interactive calls retry a 429 a few times with backoff (a user is
+    waiting); background calls raise TransientProviderError straight away
+    so Celery retries later and the worker is freed meanwhile.
+    """
+    attempt = 0
+    while True:
+        try:
+            with limiter.slot(priority, tokens), timed(f"provider.{limiter.name}"):
+                return fn(*args, **kwargs)
+        except Exception as e:
+            if priority == INTERACTIVE and is_rate_limited(e) and attempt < settings.PROVIDER_MAX_RETRIES:
+                time.sleep(0.5 * 2 ** attempt)
+                attempt += 1
+                continue
+            if is_transient(e):
+                raise TransientProviderError(str(e)) from e
+            raise
+
+
+async def acall_provider(limiter: ProviderLimiter, priority: str, tokens: int, fn, *args, **kwargs):
+    attempt = 0
+    while True:
+        try:
+            async with limiter.aslot(priority, tokens):
+                with timed(f"provider.{limiter.name}"):
+                    return await fn(*args, **kwargs)
+        except Exception as e:
+            if priority == INTERACTIVE and is_rate_limited(e) and attempt < settings.PROVIDER_MAX_RETRIES:
+                await asyncio.sleep(0.5 * 2 ** attempt)
+                attempt += 1
+                continue
+            if is_transient(e):
+                raise TransientProviderError(str(e)) from e
+            raise
+
+
+def embed_query(text: str, priority: str = INTERACTIVE) -> list[float]:
+    return call_provider(embed_limiter, priority, estimate_tokens(text), get_embeddings_model().embed_query, text)
+
+
+async def aembed_query(text: str, priority: str = INTERACTIVE) -> list[float]:
+    return await acall_provider(embed_limiter, priority, estimate_tokens(text), get_embeddings_model().aembed_query, text)
+
+
+def generate(prompt: str, priority: str = INTERACTIVE) -> str:
+    tokens = estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+    return call_provider(chat_limiter, priority, tokens, get_chat_model().invoke, prompt).content
+
+
+async def agenerate(prompt: str, priority: str = INTERACTIVE) -> str:
+    tokens = estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+    return (await acall_provider(chat_limiter, priority, tokens, get_chat_model().ainvoke, prompt)).content
 
 def clean_text(text: str) -> str:
     if not text:
@@ -21,35 +144,69 @@ def clean_text(text: str) -> str:
     return text.replace("\x00", "").replace("\u0000", "").strip()
 
 
-def process_pdf_for_rag(pdf_bytes: bytes):
+def split_pdf(pdf_bytes: bytes) -> list[dict]:
+    """Extract the PDF's text and split it into chunks tagged with their position."""
+    from PyPDF2 import PdfReader
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     reader = PdfReader(io.BytesIO(pdf_bytes))
 
     docs = []
-    for page in reader.pages:
+    for page_number, page in enumerate(reader.pages, start=1):
         text = clean_text(page.extract_text())
         if text:
-            docs.append(Document(page_content=text))
+            docs.append(Document(page_content=text, metadata={"page": page_number}))
 
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
     )
     splits = text_splitter.split_documents(docs)
 
-    full_text = " ".join([d.page_content for d in splits[:5]])
+    return [
+        {
+            "content": split.page_content,
+            "page_number": split.metadata.get("page"),
+            "chunk_index": chunk_index,
+        }
+        for chunk_index, split in enumerate(splits)
+    ]
+
 
-    summary = chat_model.invoke(
-        f"Summarize this research paper in 3 sentences: {full_text[:5000]}"
-    ).content
+def paper_head(chunks: list[dict]) -> str:
+    # Opening of the paper (title, abstract, intro) for summary and topics.
+    # Deliberately not the cached section summaries (app/summaries.py): those
+    # need every chunk embedded first and one model call per section, which
+    # would serialise ingestion behind the map step for papers nobody reviews
+    return " ".join(c["content"] for c in chunks[:5])[:5000]
+
+
+def summarize_paper(text: str) -> str:
+    return generate(f"Summarize this research paper in 3 sentences: {text}", BACKGROUND)
+
+
+def extract_topics(text: str) -> list[str]:
+    topics_str = generate(f"Extract 5 technical keywords: {text}", BACKGROUND)
+    return [t.strip() for t in topics_str.split(",")]
+
+
+def embed_chunks(texts: list[str]) -> list[list[float]]:
+    # One batched request per call instead of one request per chunk
+    tokens = sum(estimate_tokens(t) for t in texts)
+    return call_provider(embed_limiter, BACKGROUND, tokens, get_embeddings_model().embed_documents, texts)
+
+
+def process_pdf_for_rag(pdf_bytes: bytes):
+    """All ingestion stages in one process (the Celery workflow runs them in parallel)."""
+    chunks = split_pdf(pdf_bytes)
+    head = paper_head(chunks)
 
-    topics_str = chat_model.invoke(
-        f"Extract 5 technical keywords: {full_text[:5000]}"
-    ).content
-    topics = [t.strip() for t in topics_str.split(",")]
+    summary = summarize_paper(head)
+    topics = extract_topics(head)
 
-    vectors = []
-    for split in splits:
-        vector = embeddings_model.embed_query(split.page_content)
-        vectors.append({"content": split.page_content, "vector": vector})
+    vectors = embed_chunks([c["content"] for c in chunks]) if chunks else []
+    for chunk, vector in zip(chunks, vectors):
+        chunk["vector"] = vector
 
-    return summary, topics, vectors
+    return summary, topics, chunks
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import redis
+import redis.asyncio as aioredis
+
+from app.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Priority classes. Background work (ingestion) may not take the last
+# `reserve` fraction of either bucket, so interactive chat always has
+# headroom even while a large paper is being embedded.
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Two token buckets (requests/min and tokens/min) refilled continuously and
+# checked atomically. Uses the Redis clock so all workers agree on time.
+# Returns 0 if the call may proceed (and debits both buckets), otherwise
+# how many ms to wait before trying again.
+TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+
+local function level(key, capacity)
+    local b = redis.call('HMGET', key, 'level', 'ts')
+    local lvl = tonumber(b[1]) or capacity
+    local ts = tonumber(b[2]) or now
+    return math.min(capacity, lvl + (now - ts) * capacity / 60000)
+end
+
+local req = level(KEYS[1], rpm)
+local tok = level(KEYS[2], tpm)
+
+local wait = 0
+local req_floor = rpm * reserve
+local tok_floor = tpm * reserve
+if req - 1 < req_floor then
+    wait = math.max(wait, (1 + req_floor - req) * 60000 / rpm)
+end
+if tok - cost < tok_floor then
+    wait = math.max(wait, (cost + tok_floor - tok) * 60000 / tpm)
+end
+if wait == 0 then
+    req = req - 1
+    tok = tok - cost
+end
+
+redis.call('HSET', KEYS[1], 'level', req, 'ts', now)
+redis.call('HSET', KEYS[2], 'level', tok, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+redis.call('PEXPIRE', KEYS[2], 120000)
+return math.ceil(wait)
+"""
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    while exc is not None:
+        code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+        if code == 429 or "RESOURCE_EXHAUSTED" in str(exc):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class AdaptiveConcurrency:
+    """
+    Per-process AIMD limit on in-flight provider calls: halve on a 429,
+    grow by ~1 per window of successful calls. Keeps each process just
+    under the point where the provider starts throttling it.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, reserve: float):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.reserve = reserve
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_enter(self, priority: str) -> bool:
+        with self._lock:
+            limit = self.limit if priority == INTERACTIVE else max(1.0, self.limit * (1 - self.reserve))
+            if self.in_flight < int(limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def leave(self, throttled: bool):
+        with self._lock:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+class ProviderLimiter:
+    """
+    Cluster-wide limiter for one model: every process shares the Redis
+    buckets, and each process adapts its own concurrency to observed 429s.
+    Fails open (logs and lets the call through) if Redis is unreachable.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(
+        self,
+        name: str,
+        redis_url: str,
+        rpm: int,
+        tpm: int,
+        reserve: float,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+    ):
+        self.name = name
+        self.keys = [f"ratelimit:{name}:requests", f"ratelimit:{name}:tokens"]
+        # Time spent queued here shows how close we run to the quota
+        self.wait_seconds = STAGE_SECONDS.labels(f"provider.{name}.wait")
+        self.rpm = rpm
+        self.tpm = tpm
+        self.reserve = reserve
+        self.concurrency = AdaptiveConcurrency(max_concurrency, min_concurrency, max_concurrency, reserve)
+        self._redis = redis.Redis.from_url(redis_url)
+        self._aredis = aioredis.Redis.from_url(redis_url)
+        self._script = self._redis.register_script(TOKEN_BUCKET_LUA)
+        self._ascript = self._aredis.register_script(TOKEN_BUCKET_LUA)
+
+    def _args(self, priority: str, tokens: int) -> list:
+        reserve = 0 if priority == INTERACTIVE else self.reserve
+        # A single call larger than the usable bucket could never be admitted
+        cost = min(tokens, int(self.tpm * (1 - reserve)))
+        return [self.rpm, self.tpm, cost, reserve]
+
+    def _acquire(self, priority: str, tokens: int):
+        started = time.perf_counter()
+        while True:
+            try:
+                wait_ms = self._script(keys=self.keys, args=self._args(priority, tokens))
+            except redis.RedisError:
+                logger.warning("Rate limiter unavailable, letting provider call through", exc_info=True)
+                wait_ms = 0
+            if not wait_ms:
+                break
+            time.sleep(wait_ms / 1000)
+        while not self.concurrency.try_enter(priority):
+            time.sleep(self.POLL_INTERVAL)
+        self.wait_seconds.observe(time.perf_counter() - started)
+
+    async def _aacquire(self, priority: str, tokens: int):
+        started = time.perf_counter()
+        while True:
+            try:
+                wait_ms = await self._ascript(keys=self.keys, args=self._args(priority, tokens))
+            except redis.RedisError:
+                logger.warning("Rate limiter unavailable, letting provider call through", exc_info=True)
+                wait_ms = 0
+            if not wait_ms:
+                break
+            await asyncio.sleep(wait_ms / 1000)
+        while not self.concurrency.try_enter(priority):
+            await asyncio.sleep(self.POLL_INTERVAL)
+        self.wait_seconds.observe(time.perf_counter() - started)
+
+    @contextmanager
+    def slot(self, priority: str, tokens: int):
+        self._acquire(priority, tokens)
+        try:
+            yield
+        except Exception as e:
+            self.concurrency.leave(throttled=is_rate_limited(e))
+            raise
+        else:
+            self.concurrency.leave(throttled=False)
+
+    @asynccontextmanager
+    async def aslot(self, priority: str, tokens: int):
+        await self._aacquire(priority, tokens)
+        try:
+            yield
+        except Exception as e:
+            self.concurrency.leave(throttled=is_rate_limited(e))
+            raise
+        else:
+            self.concurrency.leave(throttled=False)
@@ -0,0 +1,175 @@
+import re
+
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from sqlalchemy import Select, cast, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+
+from app.config import settings
+from app.models import Embedding
+from app.metrics import timed
+
+
+def reciprocal_rank_fusion(rankings: list[list], k: int = 60) -> list:
+    """
+    Fuse several ranked lists of ids into one (RRF).
+    Each list contributes 1 / (k + rank) for every id it contains, so an id
+    ranked well by both retrievers beats one ranked first by only one.
+    """
+    scores: dict = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+VECTOR_DIM = 768
+VECTOR_SEARCH_MODES = ("exact", "halfvec", "binary")
+
+# HNSW index per compact mode. Only the configured mode's index is built
+# (migration 0002, or vector_index.py after changing the mode): each one is
+# another graph to keep in memory and to update on every chunk write.
+# The index holds the compact copy; full vectors stay in the table (it does
+# not shrink), since the re-rank reads them.
+COMPACT_INDEXES = {
+    "halfvec": ("ix_embeddings_vector_halfvec", f"(vector::halfvec({VECTOR_DIM})) halfvec_cosine_ops"),
+    "binary": ("ix_embeddings_vector_binary", f"(binary_quantize(vector)::bit({VECTOR_DIM})) bit_hamming_ops"),
+}
+
+
+def create_compact_index(mode: str) -> str:
+    name, expression = COMPACT_INDEXES[mode]
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON embeddings "
+        f"USING hnsw ({expression}) WITH (m = 16, ef_construction = 64)"
+    )
+
+
+def compact_index_statements(mode: str) -> list[str]:
+    """
+    DDL that leaves exactly the index `mode` needs: drops the other compact
+    indexes, builds this one. CONCURRENTLY, so it must run outside a
+    transaction, but writes keep flowing while it builds.
+    """
+    statements = [
+        f"DROP INDEX CONCURRENTLY IF EXISTS {name}"
+        for other, (name, _) in COMPACT_INDEXES.items() if other != mode
+    ]
+    if mode in COMPACT_INDEXES:
+        statements.append(create_compact_index(mode))
+    return statements
+
+
+def compact_distance(query_vector: list[float], mode: str):
+    """
+    Distance over the compact form of Embedding.vector. The expressions
+    match COMPACT_INDEXES, so Postgres can use the index.
+    """
+    if mode == "halfvec":
+        return cast(Embedding.vector, HALFVEC(VECTOR_DIM)).cosine_distance(cast(query_vector, HALFVEC(VECTOR_DIM)))
+    if mode == "binary":
+        return cast(func.binary_quantize(Embedding.vector), BIT(VECTOR_DIM)).hamming_distance(
+            cast(func.binary_quantize(cast(query_vector, Vector(VECTOR_DIM))), BIT(VECTOR_DIM))
+        )
+    raise ValueError(f"Unknown vector search mode {mode!r}, expected one of {VECTOR_SEARCH_MODES}")
+
+
+async def widen_hnsw_search(db: AsyncSession, rows: int):
+    """
+    Let HNSW scans in this transaction return `rows` results: it returns at
+    most hnsw.ef_search (default 40), and with a filter needs to keep
+    scanning until enough rows pass it (iterative scans, pgvector >= 0.8).
+    """
+    await db.execute(select(
+        func.set_config("hnsw.ef_search", str(max(40, rows)), True),
+        func.set_config("hnsw.iterative_scan", "relaxed_order", True),
+    ))
+
+
+async def nearest(
+    db: AsyncSession,
+    stmt: Select,
+    query_vector: list[float],
+    limit: int,
+    mode: str | None = None,
+):
+    """
+    Run `stmt` (a select over embeddings) ordered by cosine distance to
+    the query, keeping the `limit` closest rows.
+    In a compact mode the candidates come from the small halfvec / binary
+    index and only those are re-ranked against the full vectors, so the
+    ANN index stays in memory while the final order stays exact.
+    """
+    mode = mode or settings.VECTOR_SEARCH_MODE
+    exact = Embedding.vector.cosine_distance(query_vector)
+    if mode == "exact":
+        return await db.execute(stmt.order_by(exact).limit(limit))
+
+    candidates = limit * settings.VECTOR_RERANK_FACTOR
+    coarse = (
+        stmt.with_only_columns(Embedding.id)
+        .order_by(compact_distance(query_vector, mode))
+        .limit(candidates)
+        .correlate(None)
+    )
+    await widen_hnsw_search(db, candidates)
+    return await db.execute(
+        stmt.where(Embedding.id.in_(coarse.scalar_subquery())).order_by(exact).limit(limit)
+    )
+
+
+def any_terms(query: str) -> str:
+    """
+    A chat question as a websearch_to_tsquery OR query. Plain input ANDs
+    every term, so "What dataset is used for evaluation?" would only match
+    chunks containing all of them; with OR any term matches and ts_rank_cd
+    (then RRF) rewards chunks that contain more of them. Punctuation is
+    dropped so quotes and "-" aren't read as phrase / NOT operators, and
+    Postgres still stems and removes stop words.
+    """
+    return " or ".join(re.findall(r"\w+", query))
+
+
+async def hybrid_search(
+    db: AsyncSession,
+    project_id,
+    query: str,
+    query_vector: list[float],
+    k: int | None = None,
+) -> list[Embedding]:
+    """
+    Top-k chunks of a project for a query, fusing full-text rank
+    (ts_rank_cd over content_tsv) with vector similarity.
+    Full-text catches exact terms (equation names, dataset IDs, acronyms)
+    that embeddings blur, so a small k is enough.
+    """
+    k = k or settings.RETRIEVAL_TOP_K
+    candidates = max(settings.RETRIEVAL_CANDIDATES, k)
+
+    # Vectors and tsvectors are not needed by callers, don't ship them back
+    base = select(Embedding).options(defer(Embedding.vector), defer(Embedding.content_tsv))\
+        .where(Embedding.project_id == project_id)
+
+    # 1. Vector ranking
+    with timed("retrieval.vector"):
+        result = await nearest(db, base, query_vector, candidates)
+        vector_hits = result.scalars().all()
+
+    # 2. Lexical ranking
+    ts_query = func.websearch_to_tsquery("english", any_terms(query))
+    with timed("retrieval.lexical"):
+        result = await db.execute(
+            base.where(Embedding.content_tsv.op("@@")(ts_query))
+            .order_by(func.ts_rank_cd(Embedding.content_tsv, ts_query).desc())
+            .limit(candidates)
+        )
+        lexical_hits = result.scalars().all()
+
+    # 3. Fuse
+    by_id = {c.id: c for c in vector_hits}
+    by_id.update({c.id: c for c in lexical_hits})
+    fused = reciprocal_rank_fusion(
+        [[c.id for c in vector_hits], [c.id for c in lexical_hits]],
+        k=settings.RETRIEVAL_RRF_K,
+    )
+    return [by_id[i] for i in fused[:k]]
@@ -0,0 +1,136 @@
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+
+from app.config import settings
+from app.context import estimate_tokens, merge_chunks, render_spans
+from app.models import Embedding, IngestionState, Project, SectionSummary
+from app import rag
+
+SECTION_PROMPT = """
+You are summarising one section of a research paper for a peer reviewer.
+
+In at most 150 words, state what this section covers: claims, methods,
+data, results and any limitations it admits. Keep equation names, dataset
+names and numbers exactly as written. Do not speculate beyond the text.
+
+Section (pages {page_start}-{page_end}):
+{text}
+"""
+
+
+def split_into_sections(chunks, max_tokens: int) -> list[list]:
+    """Group chunks (in paper order) into consecutive sections of about `max_tokens`."""
+    sections: list[list] = []
+    current: list = []
+    size = 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk.content or "")
+        if current and size + tokens > max_tokens:
+            sections.append(current)
+            current, size = [], 0
+        current.append(chunk)
+        size += tokens
+    if current:
+        sections.append(current)
+    return sections
+
+
+async def _summarise(section: list, index: int, limit: asyncio.Semaphore) -> dict:
+    pages = [c.page_number for c in section if c.page_number is not None]
+    page_start = min(pages) if pages else None
+    page_end = max(pages) if pages else None
+
+    prompt = SECTION_PROMPT.format(
+        page_start=page_start or "?",
+        page_end=page_end or "?",
+        text=render_spans(merge_chunks(section)),
+    )
+    async with limit:
+        summary = await rag.agenerate(prompt)
+
+    return {
+        "section_index": index,
+        "chunk_start": section[0].chunk_index,
+        "chunk_end": section[-1].chunk_index,
+        "page_start": page_start,
+        "page_end": page_end,
+        "summary": summary,
+    }
+
+
+async def ingestion_done(db: AsyncSession, project_id, lock: bool = False) -> bool:
+    """
+    Whether the paper's chunks are final. With `lock`, the ingestion_states
+    row is share-locked until commit, so a re-ingest starting meanwhile
+    waits and then clears what we cached.
+    """
+    stmt = select(IngestionState.stage).where(IngestionState.project_id == project_id)
+    if lock:
+        stmt = stmt.with_for_update(read=True)
+    stage = (await db.execute(stmt)).scalar_one_or_none()
+    if stage is not None:
+        return stage == "done"
+    # Papers ingested before checkpoints were recorded
+    return bool(await db.scalar(select(Project.is_processed).where(Project.id == project_id)))
+
+
+async def get_section_summaries(db: AsyncSession, project_id) -> list[SectionSummary]:
+    """
+    Section summaries of a paper, in order. Built on first use and cached in
+    section_summaries, so later reviews (or anything else that needs a
+    whole-paper view) reuse them instead of re-reading every chunk.
+    Only cached once ingestion is done; before that they are returned unsaved.
+    """
+    result = await db.execute(
+        select(SectionSummary)
+        .where(SectionSummary.project_id == project_id)
+        .order_by(SectionSummary.section_index)
+    )
+    cached = result.scalars().all()
+    if cached:
+        return cached
+
+    # Read before the chunks: if ingestion was still running they may be
+    # partial, and finishing later doesn't make these summaries complete
+    final = await ingestion_done(db, project_id)
+    result = await db.execute(
+        select(Embedding)
+        .options(defer(Embedding.vector), defer(Embedding.content_tsv))
+        .where(Embedding.project_id == project_id)
+        .order_by(Embedding.chunk_index)
+    )
+    chunks = result.scalars().all()
+    if not chunks:
+        return []
+
+    # Map: every section is summarised concurrently, so wall time tracks the
+    # slowest section rather than the length of the paper
+    sections = split_into_sections(chunks, settings.REVIEW_SECTION_TOKENS)
+    limit = asyncio.Semaphore(settings.REVIEW_MAP_CONCURRENCY)
+    rows = await asyncio.gather(
+        *(_summarise(section, i, limit) for i, section in enumerate(sections))
+    )
+
+    if not final or not await ingestion_done(db, project_id, lock=True):
+        # Summaries of a paper still (or again) being ingested: use, don't cache
+        await db.rollback()
+        return [SectionSummary(project_id=project_id, **row) for row in rows]
+
+    # A concurrent review of the same paper may have got there first
+    await db.execute(
+        insert(SectionSummary)
+        .values([{"project_id": project_id, **row} for row in rows])
+        .on_conflict_do_nothing(index_elements=["project_id", "section_index"])
+    )
+    await db.commit()
+
+    result = await db.execute(
+        select(SectionSummary)
+        .where(SectionSummary.project_id == project_id)
+        .order_by(SectionSummary.section_index)
+    )
+    return result.scalars().all()
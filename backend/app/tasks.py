@@ -1,24 +1,134 @@
-from celery import Celery
+import os
+import time
+import uuid
+
+from celery import Celery, Task, chord
+from celery.signals import task_prerun, task_postrun, task_retry, worker_init, worker_process_shutdown
+from prometheus_client import multiprocess, start_http_server
 from app.config import settings
-from app.rag import process_pdf_for_rag
-from app.database import AsyncSessionLocal 
-from sqlalchemy import create_engine
+from app.rag import split_pdf, paper_head, summarize_paper, extract_topics, embed_chunks, TransientProviderError
+from sqlalchemy import create_engine, func, select, update, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
-from app.models import Project, Embedding
-from pgvector.sqlalchemy import Vector
+from app.models import Project, Embedding, IngestionState, SectionSummary
 from app.models import ProjectFile
+from app.progress import publish_progress
+from app.database import pool_options
+from app import metrics
+from app.metrics import timed
 
 
 # Setup Celery
 celery_app = Celery("worker", broker=settings.REDIS_URL, backend=settings.REDIS_URL)
+# Ingestion fans out many short tasks; don't let one worker prefetch them all
+celery_app.conf.worker_prefetch_multiplier = 1
 
 # Sync DB connection for Celery (Simpler for background tasks)
 SYNC_DATABASE_URL = settings.DATABASE_URL.replace("+asyncpg", "+psycopg2")
-engine = create_engine(SYNC_DATABASE_URL)
+engine = create_engine(SYNC_DATABASE_URL, **pool_options())
 SessionLocal = sessionmaker(bind=engine)
 
-@celery_app.task
-@celery_app.task
+# Ingestion runs as a chord:
+#
+#   process_paper_task (extract + split, plan the remaining work)
+#       -> embed_shard_task x N  \
+#       -> summarize_paper_task   }-- in parallel across workers
+#       -> extract_topics_task   /
+#   -> finalize_paper_task (centroid, is_processed)
+#
+# Every stage is idempotent and checkpointed in ingestion_states / the rows
+# it writes, so a retry or a manual re-run of process_paper_task only does
+# the work that is still missing:
+# - chunk ids are derived from (project_id, chunk_index) and upserted
+# - abstract / topics are skipped once stored
+# - only shards with missing chunks are dispatched
+
+# Task metrics, served by the worker on CELERY_METRICS_PORT. With the prefork
+# pool set PROMETHEUS_MULTIPROC_DIR so child processes' metrics are merged.
+_task_started: dict[str, float] = {}
+
+
+@task_prerun.connect
+def _record_task_start(task_id=None, **_):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _record_task_time(task_id=None, task=None, state=None, **_):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        metrics.TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+@task_retry.connect
+def _record_task_retry(sender=None, **_):
+    metrics.TASK_RETRIES.labels(sender.name).inc()
+
+
+@worker_init.connect
+def _start_metrics_server(**_):
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    start_http_server(settings.CELERY_METRICS_PORT, registry=metrics.registry())
+
+
+@worker_process_shutdown.connect
+def _mark_process_dead(pid=None, **_):
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+RETRY_POLICY = dict(
+    autoretry_for=(TransientProviderError, OperationalError),
+    retry_backoff=True,
+    retry_backoff_max=settings.INGEST_RETRY_BACKOFF_MAX,
+    retry_jitter=True,
+    max_retries=settings.INGEST_MAX_RETRIES,
+)
+
+
+def chunk_id(project_id: str, chunk_index: int) -> uuid.UUID:
+    return uuid.uuid5(uuid.UUID(str(project_id)), f"chunk-{chunk_index}")
+
+
+def count_chunks(project_id: str):
+    """Scalar subquery: distinct chunks of the project stored so far."""
+    return (
+        select(func.count(func.distinct(Embedding.chunk_index)))
+        .where(Embedding.project_id == project_id)
+        .scalar_subquery()
+    )
+
+
+def clear_section_summaries(session, project_id: str):
+    session.query(SectionSummary).filter(
+        SectionSummary.project_id == project_id
+    ).delete(synchronize_session=False)
+
+
+def set_state(session, project_id: str, **values):
+    stmt = insert(IngestionState).values(project_id=project_id, **values)
+    session.execute(stmt.on_conflict_do_update(index_elements=["project_id"], set_=values))
+
+
+class IngestionTask(Task):
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        # Retries exhausted (or a non-retryable error): record it on the checkpoint
+        project_id = kwargs.get("project_id") or (args[0] if args else None)
+        if not project_id:
+            return
+        error = f"{self.name}: {exc}"[:2000]
+        session = SessionLocal()
+        try:
+            set_state(session, project_id, stage="failed", error=error)
+            session.commit()
+        finally:
+            session.close()
+        publish_progress(project_id, stage="failed", error=error)
+
+
+@celery_app.task(base=IngestionTask, **RETRY_POLICY)
 def process_paper_task(project_id: str):
     session = SessionLocal()
     try:
@@ -31,28 +141,176 @@ def process_paper_task(project_id: str):
         if not project_file:
             raise Exception("Project file not found")
 
-        pdf_bytes = project_file.data
+        project = session.get(Project, project_id)
+        state = session.get(IngestionState, project_id)
+        if project.is_processed and state and state.stage == "done":
+            return
 
-        summary, topics, vectors = process_pdf_for_rag(pdf_bytes)
+        publish_progress(project_id, stage="extracting")
 
-        project = session.query(Project).get(project_id)
-        project.abstract = summary
-        project.topics = topics
-        project.is_processed = True
+        # Splitting is deterministic, so chunk_index identifies the same
+        # chunk on every attempt
+        with timed("ingest.split"):
+            chunks = split_pdf(project_file.data)
 
-        for v in vectors:
-            session.add(
-                Embedding(
-                    project_id=project_id,
-                    content=v["content"],
-                    vector=v["vector"]
-                )
-            )
+        # Rows left over from a differently split earlier run
+        session.query(Embedding).filter(
+            Embedding.project_id == project_id,
+            or_(Embedding.chunk_index.is_(None), Embedding.chunk_index >= len(chunks))
+        ).delete(synchronize_session=False)
+
+        done = set(session.scalars(
+            select(Embedding.chunk_index).where(Embedding.project_id == project_id)
+        ))
 
+        set_state(
+            session, project_id,
+            stage="embedding",
+            chunks_total=len(chunks),
+            chunks_done=len(done),
+            attempts=(state.attempts if state else 0) + 1,
+            error=None,
+        )
+        # Cached review summaries describe the chunks being rewritten. After
+        # set_state: that waits for a review holding the state row (see
+        # app/summaries.py) to commit, so its rows are cleared here too
+        clear_section_summaries(session, project_id)
         session.commit()
 
+        publish_progress(project_id, stage="embedding", chunks_total=len(chunks), chunks_done=len(done), error=None)
+
+        need_abstract = not project.abstract
+        need_topics = not project.topics
     except Exception as e:
         session.rollback()
         raise e
     finally:
         session.close()
+
+    head = paper_head(chunks)
+    size = settings.EMBED_SHARD_SIZE
+    missing = [c for c in chunks if c["chunk_index"] not in done]
+    header = [
+        embed_shard_task.s(chunks=missing[i:i + size], project_id=project_id)
+        for i in range(0, len(missing), size)
+    ]
+    if need_abstract:
+        header.append(summarize_paper_task.s(head=head, project_id=project_id))
+    if need_topics:
+        header.append(extract_topics_task.s(head=head, project_id=project_id))
+
+    if header:
+        chord(header)(finalize_paper_task.s(project_id=project_id))
+    else:
+        finalize_paper_task.delay([], project_id=project_id)
+
+
+@celery_app.task(base=IngestionTask, **RETRY_POLICY)
+def embed_shard_task(chunks: list[dict], project_id: str):
+    vectors = embed_chunks([c["content"] for c in chunks])
+
+    session = SessionLocal()
+    try:
+        rows = [
+            {
+                "id": chunk_id(project_id, c["chunk_index"]),
+                "project_id": project_id,
+                "content": c["content"],
+                "vector": v,
+                "page_number": c["page_number"],
+                "chunk_index": c["chunk_index"],
+            }
+            for c, v in zip(chunks, vectors)
+        ]
+        stmt = insert(Embedding).values(rows)
+        with timed("ingest.upsert"):
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=["id"],
+                set_={
+                    "content": stmt.excluded.content,
+                    "vector": stmt.excluded.vector,
+                    "page_number": stmt.excluded.page_number,
+                    "chunk_index": stmt.excluded.chunk_index,
+                },
+            ))
+        session.commit()
+
+        # Counted (not incremented, so a retried shard isn't counted twice)
+        # after our rows are committed, in one statement so concurrent shards
+        # can't overwrite each other's count; GREATEST keeps it monotonic
+        # when another shard's count ran on an older snapshot
+        done = session.scalar(
+            update(IngestionState)
+            .where(IngestionState.project_id == project_id)
+            .values(chunks_done=func.greatest(IngestionState.chunks_done, count_chunks(project_id)))
+            .returning(IngestionState.chunks_done)
+        )
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+    publish_progress(project_id, chunks_done=done)
+
+    return {"embedded": len(rows)}
+
+
+@celery_app.task(base=IngestionTask, **RETRY_POLICY)
+def summarize_paper_task(head: str, project_id: str):
+    abstract = summarize_paper(head)
+    session = SessionLocal()
+    try:
+        session.execute(update(Project).where(Project.id == project_id).values(abstract=abstract))
+        session.commit()
+    finally:
+        session.close()
+    return {"abstract": True}
+
+
+@celery_app.task(base=IngestionTask, **RETRY_POLICY)
+def extract_topics_task(head: str, project_id: str):
+    topics = extract_topics(head)
+    session = SessionLocal()
+    try:
+        session.execute(update(Project).where(Project.id == project_id).values(topics=topics))
+        session.commit()
+    finally:
+        session.close()
+    return {"topics": True}
+
+
+@celery_app.task(base=IngestionTask, **RETRY_POLICY)
+def finalize_paper_task(results: list[dict], project_id: str):
+    session = SessionLocal()
+    try:
+        state = session.get(IngestionState, project_id)
+        # Recount the rows rather than trust the progress counter
+        done = session.scalar(select(count_chunks(project_id)))
+        if state and done < state.chunks_total:
+            raise Exception(
+                f"Only {done}/{state.chunks_total} chunks embedded; re-run process_paper_task to resume"
+            )
+
+        set_state(session, project_id, stage="finalizing", chunks_done=done)
+        publish_progress(project_id, stage="finalizing")
+        centroid = (
+            select(func.avg(Embedding.vector))
+            .where(Embedding.project_id == project_id)
+            .scalar_subquery()
+        )
+        session.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(centroid=centroid, is_processed=True)
+        )
+        set_state(session, project_id, stage="done")
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+    publish_progress(project_id, stage="done")
@@ -0,0 +1,120 @@
+import json
+import platform
+import random
+import subprocess
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+WORDS = (
+    "transformer attention embedding retrieval gradient dataset baseline ablation "
+    "convolution latency throughput benchmark variance regression encoder decoder "
+    "quantization sparsity tokenizer corpus inference optimizer momentum dropout"
+).split()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], elapsed: float | None = None) -> dict:
+    """Latency summary in milliseconds (plus throughput if `elapsed` is given)."""
+    summary = {
+        "n": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+    }
+    if elapsed:
+        summary["rps"] = round(len(latencies) / elapsed, 2)
+    return summary
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: Path, results: dict, config: dict):
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "config": config,
+        },
+        "results": results,
+    }
+    path.write_text(json.dumps(report, indent=2, default=str))
+    return report
+
+
+def make_pdf(pages: int, words_per_page: int = 400, seed: int | None = None) -> bytes:
+    """
+    A valid text PDF of `pages` pages of random technical words, so
+    ingestion can be benchmarked without shipping sample papers.
+    """
+    rng = random.Random(seed)
+    objects: list[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree exists
+    pages_obj = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for _ in range(pages):
+        lines = []
+        words = [rng.choice(WORDS) for _ in range(words_per_page)]
+        for i in range(0, len(words), 12):
+            lines.append(" ".join(words[i:i + 12]))
+        text = b"BT /F1 10 Tf 50 780 Td 12 TL " + b" ".join(
+            b"(" + line.encode() + b") Tj T*" for line in lines
+        ) + b" ET"
+        stream = zlib.compress(text)
+        content = add(
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_obj, font, content)
+        ))
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % p for p in page_ids), len(page_ids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
@@ -0,0 +1,47 @@
+"""
+Compare two benchmark reports written by benchmarks.run.
+
+    python -m benchmarks.compare results/before.json results/after.json
+
+Prints every numeric metric side by side with the relative change.
+"""
+import argparse
+import json
+from pathlib import Path
+
+
+def flatten(data, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    args = parser.parse_args()
+
+    before = flatten(json.loads(args.before.read_text())["results"])
+    after = flatten(json.loads(args.after.read_text())["results"])
+
+    width = max((len(k) for k in before.keys() | after.keys()), default=10)
+    print(f"{'metric':<{width}}  {'before':>12}  {'after':>12}  {'change':>8}")
+    for key in sorted(before.keys() | after.keys()):
+        old, new = before.get(key), after.get(key)
+        if old is None or new is None:
+            change = "n/a"
+        elif old == 0:
+            change = "-" if new == 0 else "new"
+        else:
+            change = f"{(new - old) / old * 100:+.1f}%"
+        print(f"{key:<{width}}  {old if old is not None else '-':>12}  {new if new is not None else '-':>12}  {change:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Ingestion benchmark: end-to-end latency and throughput for a batch of PDFs.
+
+    # Celery workflow (needs running workers)
+    python -m benchmarks.ingestion path/to/pdfs --mode workflow
+
+    # Baseline: every stage sequentially in this process
+    python -m benchmarks.ingestion path/to/pdfs --mode inline
+
+Run from the backend/ directory. Prints a JSON report.
+"""
+import argparse
+import json
+import time
+import uuid
+from pathlib import Path
+
+from app.rag import process_pdf_for_rag
+from app.tasks import SessionLocal, process_paper_task
+from app.models import User, Project, ProjectFile, Embedding
+from benchmarks.common import percentile
+
+BENCH_USER_ID = "bench_user"
+
+
+def create_projects(pdfs: list[Path]) -> list[str]:
+    session = SessionLocal()
+    try:
+        if not session.get(User, BENCH_USER_ID):
+            session.add(User(id=BENCH_USER_ID, email="bench@resplanet.local", name="Benchmark"))
+
+        ids = []
+        for pdf in pdfs:
+            project = Project(id=uuid.uuid4(), user_id=BENCH_USER_ID, title=f"[bench] {pdf.name}", views_count=0)
+            session.add(project)
+            session.add(ProjectFile(
+                project_id=project.id,
+                filename=pdf.name,
+                content_type="application/pdf",
+                data=pdf.read_bytes()
+            ))
+            ids.append(str(project.id))
+        session.commit()
+        return ids
+    finally:
+        session.close()
+
+
+def run_inline(project_ids: list[str]) -> dict[str, float]:
+    # Latency is measured from the start of the batch, as in workflow mode
+    started = time.perf_counter()
+    latencies = {}
+    for project_id in project_ids:
+        session = SessionLocal()
+        try:
+            project_file = session.query(ProjectFile).filter(ProjectFile.project_id == project_id).one()
+            summary, topics, chunks = process_pdf_for_rag(project_file.data)
+            project = session.get(Project, project_id)
+            project.abstract = summary
+            project.topics = topics
+            project.is_processed = True
+            session.add_all([
+                Embedding(
+                    project_id=project_id,
+                    content=c["content"],
+                    vector=c["vector"],
+                    page_number=c["page_number"],
+                    chunk_index=c["chunk_index"]
+                )
+                for c in chunks
+            ])
+            session.commit()
+        finally:
+            session.close()
+        latencies[project_id] = time.perf_counter() - started
+    return latencies
+
+
+def run_workflow(project_ids: list[str], timeout: float) -> dict[str, float]:
+    started = time.perf_counter()
+    for project_id in project_ids:
+        process_paper_task.delay(project_id)
+
+    latencies = {}
+    while len(latencies) < len(project_ids):
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError(f"{len(project_ids) - len(latencies)} papers still processing after {timeout}s")
+        session = SessionLocal()
+        try:
+            done = session.query(Project.id).filter(
+                Project.id.in_(project_ids), Project.is_processed.is_(True)
+            ).all()
+        finally:
+            session.close()
+        for (project_id,) in done:
+            latencies.setdefault(str(project_id), time.perf_counter() - started)
+        time.sleep(0.2)
+    return latencies
+
+
+def count_chunks(project_ids: list[str]) -> int:
+    session = SessionLocal()
+    try:
+        return session.query(Embedding).filter(Embedding.project_id.in_(project_ids)).count()
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf_dir", type=Path)
+    parser.add_argument("--mode", choices=["workflow", "inline"], default="workflow")
+    parser.add_argument("--timeout", type=float, default=1800)
+    args = parser.parse_args()
+
+    pdfs = sorted(args.pdf_dir.glob("*.pdf"))
+    if not pdfs:
+        raise SystemExit(f"No PDFs in {args.pdf_dir}")
+
+    project_ids = create_projects(pdfs)
+
+    started = time.perf_counter()
+    if args.mode == "inline":
+        latencies = run_inline(project_ids)
+    else:
+        latencies = run_workflow(project_ids, args.timeout)
+    elapsed = time.perf_counter() - started
+
+    chunks = count_chunks(project_ids)
+    values = list(latencies.values())
+    print(json.dumps({
+        "benchmark": "ingestion",
+        "mode": args.mode,
+        "papers": len(project_ids),
+        "chunks": chunks,
+        "elapsed_s": round(elapsed, 3),
+        "papers_per_min": round(len(project_ids) / elapsed * 60, 2),
+        "chunks_per_s": round(chunks / elapsed, 2),
+        "paper_latency_p50_s": round(percentile(values, 50), 3),
+        "paper_latency_max_s": round(max(values), 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Recall / memory / latency comparison of the chunk vector search modes.
+
+Needs a migrated, populated database (seed.py gives clustered vectors):
+
+    # from backend/
+    alembic upgrade head
+    python seed.py --users 1000 --projects 20000 --chunks 50
+    python -m benchmarks.quantization --out results/quantization.json
+
+For every mode in app.retrieval.VECTOR_SEARCH_MODES, runs the same
+queries through app.retrieval.nearest in two scopes:
+    project    chunks of one paper (what /chat and @bot retrieve from)
+    global     every chunk (where the ANN index does the work)
+and reports recall@k against exact search, latency, and the on-disk
+size of the table and of each vector index.
+
+A deployment only has the index of its own VECTOR_SEARCH_MODE; without
+one a compact mode falls back to scanning. --build-indexes builds the
+missing compact indexes for the run and drops them again afterwards
+(--keep-indexes to keep them).
+
+The memory baseline is a full-precision (vector_cosine_ops) HNSW index,
+which the app itself does not keep. With --build-baseline one is built
+(same m / ef_construction), measured and dropped again; otherwise its
+size is estimated from the halfvec index, which has the same graph and
+2 instead of 4 bytes per dimension. Either way these are index sizes:
+the table keeps the full vectors in every mode.
+"""
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import func, select, text
+
+from app.database import AsyncSessionLocal, engine
+from app.models import Embedding
+from app.retrieval import COMPACT_INDEXES, VECTOR_DIM, VECTOR_SEARCH_MODES, create_compact_index, nearest
+from benchmarks.common import Timer, summarize, write_results
+
+INDEXES = {mode: name for mode, (name, _) in COMPACT_INDEXES.items()}
+FULL_INDEX = "ix_bench_embeddings_vector_full"
+FULL_INDEX_DDL = (
+    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {FULL_INDEX} ON embeddings "
+    "USING hnsw (vector vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+)
+
+
+async def sample_queries(db, count: int, noise: float, seed: int | None) -> list[tuple]:
+    """Stored chunk vectors plus noise, so each query has a known paper."""
+    rows = (await db.execute(
+        select(Embedding.project_id, Embedding.vector).order_by(func.random()).limit(count)
+    )).all()
+    rng = np.random.default_rng(seed)
+    queries = []
+    for project_id, vector in rows:
+        q = np.asarray(vector, dtype=np.float32) + noise * rng.standard_normal(len(vector), dtype=np.float32)
+        queries.append((project_id, (q / np.linalg.norm(q)).tolist()))
+    return queries
+
+
+def megabytes(size: int | None) -> float:
+    return round((size or 0) / 1e6, 2)
+
+
+async def index_size(db, name: str) -> int | None:
+    return await db.scalar(text("SELECT pg_relation_size(to_regclass(:name))"), {"name": name})
+
+
+async def execute_ddl(stmt: str) -> float:
+    # Outside a transaction, like the migrations' CONCURRENTLY builds
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        with Timer() as t:
+            await conn.execute(text(stmt))
+    return round(t.elapsed, 1)
+
+
+async def build_indexes(args) -> dict[str, tuple[str, float]]:
+    """Build the indexes the run needs but the database lacks; returns {name: (mode, seconds)}."""
+    wanted = {}
+    if args.build_indexes:
+        wanted.update({name: (mode, create_compact_index(mode)) for mode, name in INDEXES.items()})
+    if args.build_baseline:
+        wanted[FULL_INDEX] = ("full", FULL_INDEX_DDL)
+
+    built = {}
+    async with AsyncSessionLocal() as db:
+        existing = {name for name in wanted if await index_size(db, name) is not None}
+    for name, (mode, ddl) in wanted.items():
+        if name in existing:
+            continue
+        print(f"🏗  building {mode} index")
+        built[name] = (mode, await execute_ddl(ddl))
+    return built
+
+
+async def sizes(db) -> dict:
+    rows = await db.scalar(select(func.count()).select_from(Embedding))
+    result = {
+        "rows": rows,
+        "embeddings_table_mb": megabytes(await db.scalar(text("SELECT pg_table_size('embeddings')"))),
+    }
+    for mode, index in INDEXES.items():
+        result[f"{mode}_index_mb"] = megabytes(await index_size(db, index))
+
+    full = await index_size(db, FULL_INDEX)
+    if full:
+        result["full_index_mb"] = megabytes(full)
+    elif result["halfvec_index_mb"]:
+        result["full_index_mb_estimated"] = megabytes(
+            await index_size(db, INDEXES["halfvec"]) + rows * VECTOR_DIM * 2
+        )
+    baseline = result.get("full_index_mb") or result.get("full_index_mb_estimated")
+    if baseline:
+        for mode in INDEXES:
+            if not result[f"{mode}_index_mb"]:
+                continue
+            result[f"{mode}_vs_full"] = round(result[f"{mode}_index_mb"] / baseline, 3)
+    return result
+
+
+async def run_mode(mode: str, queries: list[tuple], k: int, scope: str) -> tuple[list[list], list[float]]:
+    hits, latencies = [], []
+    for project_id, vector in queries:
+        stmt = select(Embedding.id)
+        if scope == "project":
+            stmt = stmt.where(Embedding.project_id == project_id)
+        # Own transaction per query so SET LOCAL search settings don't leak
+        async with AsyncSessionLocal() as db:
+            with Timer() as t:
+                result = await nearest(db, stmt, vector, k, mode=mode)
+                ids = result.scalars().all()
+        latencies.append(t.elapsed)
+        hits.append(ids)
+    return hits, latencies
+
+
+def recall(truth: list[list], found: list[list]) -> float:
+    scores = [len(set(t) & set(f)) / len(t) for t, f in zip(truth, found) if t]
+    return round(sum(scores) / len(scores), 4) if scores else 0.0
+
+
+async def main(args):
+    built = await build_indexes(args)
+    try:
+        async with AsyncSessionLocal() as db:
+            queries = await sample_queries(db, args.queries, args.noise, args.seed)
+            results = {"sizes": await sizes(db)}
+        for mode, seconds in built.values():
+            results["sizes"][f"{mode}_index_build_s"] = seconds
+        missing = [mode for mode, name in INDEXES.items() if not results["sizes"][f"{mode}_index_mb"]]
+        if missing:
+            print(f"⚠️  no index for {', '.join(missing)}: those modes scan (use --build-indexes)")
+
+        for scope in args.scopes:
+            print(f"⏱  {scope}")
+            truth, latencies = await run_mode("exact", queries, args.k, scope)
+            results[scope] = {"exact": {"recall": 1.0, "latency": summarize(latencies)}}
+            for mode in VECTOR_SEARCH_MODES:
+                if mode == "exact":
+                    continue
+                found, latencies = await run_mode(mode, queries, args.k, scope)
+                results[scope][mode] = {"recall": recall(truth, found), "latency": summarize(latencies)}
+    finally:
+        if not args.keep_indexes:
+            for name in built:
+                await execute_ddl(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+    config = {k: v for k, v in vars(args).items() if k != "out"}
+    report = write_results(args.out, results, config)
+    print(json.dumps(report["results"], indent=2))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", type=Path, default=Path("quantization_results.json"))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20, help="neighbours per query (recall@k)")
+    parser.add_argument("--noise", type=float, default=0.05, help="perturbation added to sampled query vectors")
+    parser.add_argument("--scopes", type=lambda s: s.split(","), default=["project", "global"])
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--build-indexes", action="store_true",
+                        help="build the compact indexes the database lacks (the app only keeps its own mode's)")
+    parser.add_argument("--build-baseline", action="store_true",
+                        help="build a full-precision HNSW index to measure instead of estimating its size")
+    parser.add_argument("--keep-indexes", action="store_true", help="don't drop the indexes built for the run")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,279 @@
+"""
+End-to-end benchmark / load-test suite for the API.
+
+Runs against a live stack (API + Celery + Postgres/pgvector + Redis) with
+the model providers stubbed, so numbers measure our code and
+infrastructure rather than Gemini:
+
+    # in backend/.env (or the environment of the api and celery services)
+    MODEL_PROVIDER=stub
+    docker-compose up -d --build
+
+    # from backend/
+    python -m benchmarks.run --out results/before.json
+    python -m benchmarks.run --out results/after.json
+    python -m benchmarks.compare results/before.json results/after.json
+
+Suites (select with --suites):
+    ingestion  upload generated PDFs, papers/min and chunks/sec until done
+    chat       POST /chat latency
+    feed       /feed and /feed/trending latency at each --sizes table size
+               (the table is grown with seed.py between sizes)
+    ws         websocket fan-out latency by room size
+    download   PDF download throughput
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from argparse import Namespace
+from pathlib import Path
+
+import asyncpg
+import httpx
+import websockets
+
+from app.database import DATABASE_URL
+from benchmarks.common import Timer, make_pdf, summarize, write_results
+
+SUITES = ["ingestion", "chat", "feed", "ws", "download"]
+QUERIES = [
+    "What dataset is used for evaluation?",
+    "How does the attention mechanism scale with sequence length?",
+    "What are the main limitations of the baseline?",
+    "Which optimizer and learning rate were used?",
+]
+
+
+async def db_connect():
+    return await asyncpg.connect(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://"))
+
+
+async def sample_ids(conn, limit: int = 200) -> tuple[list[str], list[str]]:
+    users = [r["id"] for r in await conn.fetch("SELECT id FROM users LIMIT $1", limit)]
+    projects = [
+        str(r["id"])
+        for r in await conn.fetch(
+            "SELECT id FROM projects WHERE is_processed ORDER BY random() LIMIT $1", limit
+        )
+    ]
+    return users, projects
+
+
+async def ensure_seeded(conn, projects: int, chunks: int):
+    """Grow the dataset to at least `projects` projects using seed.py."""
+    from seed import seed_data
+
+    current = await conn.fetchval("SELECT count(*) FROM projects")
+    if current >= projects:
+        return
+    await seed_data(Namespace(
+        users=max(10, (projects - current) // 10),
+        projects=projects - current,
+        chunks=chunks,
+        messages=4,
+        collab_rate=0.6,
+        spread=0.05,
+        batch_size=5000,
+        seed=None,
+    ))
+
+
+async def run_load(request, total: int, concurrency: int) -> tuple[list[float], float, int]:
+    """Call `request()` `total` times with bounded concurrency; returns latencies, elapsed, errors."""
+    latencies: list[float] = []
+    errors = 0
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with limit:
+            started = time.perf_counter()
+            try:
+                response = await request()
+                response.raise_for_status()
+            except (httpx.HTTPError, OSError):
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    with Timer() as t:
+        await asyncio.gather(*(one() for _ in range(total)))
+    return latencies, t.elapsed, errors
+
+
+async def bench_ingestion(client: httpx.AsyncClient, args, users: list[str]) -> dict:
+    pdfs = [make_pdf(args.pdf_pages, seed=i) for i in range(args.papers)]
+    user_id = users[0]
+
+    started = time.perf_counter()
+    project_ids = []
+    for i, pdf in enumerate(pdfs):
+        response = await client.post(
+            "/upload",
+            data={"user_id": user_id},
+            files={"file": (f"bench_{i}.pdf", pdf, "application/pdf")},
+        )
+        response.raise_for_status()
+        project_ids.append(response.json()["id"])
+
+    finished: dict[str, float] = {}
+    chunks = 0
+    failed = 0
+    while len(finished) < len(project_ids):
+        if time.perf_counter() - started > args.timeout:
+            break
+        for project_id in project_ids:
+            if project_id in finished:
+                continue
+            state = (await client.get(f"/projects/{project_id}/status")).json()
+            if state.get("stage") in ("done", "failed"):
+                finished[project_id] = time.perf_counter() - started
+                chunks += int(state.get("chunks_total") or 0)
+                failed += state["stage"] == "failed"
+        await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "papers": len(project_ids),
+        "pages_per_paper": args.pdf_pages,
+        "completed": len(finished),
+        "failed": failed,
+        "chunks": chunks,
+        "elapsed_s": round(elapsed, 3),
+        "papers_per_min": round(len(finished) / elapsed * 60, 2),
+        "chunks_per_s": round(chunks / elapsed, 2),
+        "paper_latency": summarize(list(finished.values())),
+    }
+
+
+async def bench_chat(client: httpx.AsyncClient, args, projects: list[str]) -> dict:
+    async def request():
+        return await client.post(
+            "/chat", params={"query": random.choice(QUERIES), "project_id": random.choice(projects)}
+        )
+
+    latencies, elapsed, errors = await run_load(request, args.requests, args.concurrency)
+    return {**summarize(latencies, elapsed), "errors": errors}
+
+
+async def bench_feed(client: httpx.AsyncClient, args, conn) -> dict:
+    results = {}
+    for size in args.sizes:
+        await ensure_seeded(conn, size, args.chunks)
+        rows = await conn.fetchval("SELECT count(*) FROM projects")
+        results[str(size)] = {"projects": rows}
+        for route in ("/feed", "/feed/trending"):
+            latencies, elapsed, errors = await run_load(
+                lambda: client.get(route), args.requests, args.concurrency
+            )
+            results[str(size)][route] = {**summarize(latencies, elapsed), "errors": errors}
+    return results
+
+
+async def bench_ws(args, users: list[str], projects: list[str]) -> dict:
+    ws_url = args.base_url.replace("http", "ws", 1)
+    results = {}
+    for room_size in args.room_sizes:
+        project_id = random.choice(projects)
+        sockets = [
+            await websockets.connect(f"{ws_url}/ws/chat/{project_id}/{random.choice(users)}")
+            for _ in range(room_size)
+        ]
+        sender, latencies = sockets[0], []
+        try:
+            for _ in range(args.ws_messages):
+                token = uuid.uuid4().hex
+                started = time.perf_counter()
+                await sender.send(f"bench {token}")
+
+                async def receive(ws):
+                    while token not in await ws.recv():
+                        pass
+
+                # Fan-out latency: until the last member of the room has it
+                await asyncio.wait_for(asyncio.gather(*(receive(ws) for ws in sockets)), timeout=30)
+                latencies.append(time.perf_counter() - started)
+        finally:
+            for ws in sockets:
+                await ws.close()
+        results[str(room_size)] = summarize(latencies)
+    return results
+
+
+async def bench_download(client: httpx.AsyncClient, args, projects: list[str]) -> dict:
+    transferred = 0
+
+    async def request():
+        nonlocal transferred
+        response = await client.get(f"/projects/{random.choice(projects)}/file")
+        transferred += len(response.content)
+        return response
+
+    latencies, elapsed, errors = await run_load(request, args.requests, args.concurrency)
+    return {
+        **summarize(latencies, elapsed),
+        "errors": errors,
+        "mb_per_s": round(transferred / elapsed / 1e6, 2),
+    }
+
+
+async def main(args):
+    conn = await db_connect()
+    results = {}
+    try:
+        # Something to query even on an empty database
+        await ensure_seeded(conn, min(args.sizes), args.chunks)
+        users, projects = await sample_ids(conn)
+
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=120) as client:
+            if "ingestion" in args.suites:
+                print("⏱  ingestion")
+                results["ingestion"] = await bench_ingestion(client, args, users)
+            if "chat" in args.suites:
+                print("⏱  chat")
+                results["chat"] = await bench_chat(client, args, projects)
+            if "ws" in args.suites:
+                print("⏱  ws fan-out")
+                results["ws_fanout"] = await bench_ws(args, users, projects)
+            if "download" in args.suites:
+                print("⏱  download")
+                results["download"] = await bench_download(client, args, projects)
+            # Last, because it grows the tables
+            if "feed" in args.suites:
+                print("⏱  feed")
+                results["feed"] = await bench_feed(client, args, conn)
+    finally:
+        await conn.close()
+
+    config = {k: v for k, v in vars(args).items() if k != "out"}
+    report = write_results(args.out, results, config)
+    print(json.dumps(report["results"], indent=2))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--out", type=Path, default=Path("bench_results.json"))
+    parser.add_argument("--suites", type=lambda s: s.split(","), default=SUITES)
+    parser.add_argument("--requests", type=int, default=500, help="requests per HTTP measurement")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1_000, 10_000, 100_000],
+                        help="project table sizes for the feed suite")
+    parser.add_argument("--chunks", type=int, default=20, help="embedding rows per seeded project")
+    parser.add_argument("--papers", type=int, default=20, help="PDFs uploaded by the ingestion suite")
+    parser.add_argument("--pdf-pages", type=int, default=10)
+    parser.add_argument("--room-sizes", type=lambda s: [int(x) for x in s.split(",")], default=[2, 10, 50, 200])
+    parser.add_argument("--ws-messages", type=int, default=50, help="messages per room size")
+    parser.add_argument("--timeout", type=float, default=1800, help="ingestion timeout (s)")
+    args = parser.parse_args()
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
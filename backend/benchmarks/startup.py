@@ -0,0 +1,96 @@
+"""
+Cold-start benchmark for the API and the Celery worker.
+
+Each run is a fresh interpreter, so module caches are cold the way they
+are after a deploy or an autoscaling event:
+
+    # from backend/
+    python -m benchmarks.startup --out results/startup.json
+    python -m benchmarks.startup --serve --out results/startup.json   # needs DB + Redis
+
+Measures:
+    import     wall time of `import app.main` / `import app.tasks`
+    serve      (--serve) uvicorn spawn until /metrics answers, which
+               includes the startup event (schema check, chat writer)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import summarize, write_results
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MODULES = ["app.main", "app.tasks"]
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def child_env() -> dict:
+    # Stub models so provider clients never affect (or fail) the measurement
+    return {**os.environ, "MODEL_PROVIDER": os.environ.get("MODEL_PROVIDER", "stub")}
+
+
+def time_import(module: str) -> float:
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=BACKEND_DIR, env=child_env(), text=True,
+    )
+    return float(output.strip().splitlines()[-1])
+
+
+def time_serve(port: int, timeout: float) -> float:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        cwd=BACKEND_DIR, env=child_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode} (is the schema migrated?)")
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1).raise_for_status()
+                return time.perf_counter() - started
+            except httpx.HTTPError:
+                time.sleep(0.02)
+        raise TimeoutError(f"API not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args):
+    results = {}
+    for module in MODULES:
+        print(f"⏱  import {module}")
+        results[f"import {module}"] = summarize([time_import(module) for _ in range(args.runs)])
+    if args.serve:
+        print("⏱  serve")
+        results["serve"] = summarize([time_serve(args.port, args.timeout) for _ in range(args.runs)])
+
+    config = {k: v for k, v in vars(args).items() if k != "out"}
+    report = write_results(args.out, results, config)
+    print(json.dumps(report["results"], indent=2))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", type=Path, default=Path("startup_results.json"))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--serve", action="store_true", help="also time uvicorn until the API answers")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,156 @@
+"""baseline schema
+
+Everything the app used to build on startup with create_all plus the
+idempotent SCHEMA_UPGRADES list. Every statement is IF NOT EXISTS, so this
+also adopts databases created that way: `alembic upgrade head` brings
+them to the same state and stamps them, without touching existing rows.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+UPGRADE = [
+    "CREATE EXTENSION IF NOT EXISTS vector",
+
+    # 1. Tables
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id VARCHAR PRIMARY KEY,
+        email VARCHAR NOT NULL,
+        name VARCHAR,
+        picture VARCHAR
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS projects (
+        id UUID PRIMARY KEY,
+        user_id VARCHAR REFERENCES users (id),
+        title VARCHAR NOT NULL,
+        file_url VARCHAR,
+        abstract TEXT,
+        topics VARCHAR[],
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        is_processed BOOLEAN,
+        views_count INTEGER,
+        centroid vector(768)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS project_files (
+        id UUID PRIMARY KEY,
+        project_id UUID UNIQUE REFERENCES projects (id),
+        filename VARCHAR,
+        content_type VARCHAR,
+        data BYTEA,
+        created_at TIMESTAMP WITHOUT TIME ZONE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS embeddings (
+        id UUID PRIMARY KEY,
+        project_id UUID REFERENCES projects (id),
+        content TEXT,
+        page_number INTEGER,
+        chunk_index INTEGER,
+        vector vector(768),
+        content_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ingestion_states (
+        project_id UUID PRIMARY KEY REFERENCES projects (id),
+        stage VARCHAR NOT NULL,
+        chunks_total INTEGER,
+        chunks_done INTEGER,
+        attempts INTEGER,
+        error TEXT,
+        updated_at TIMESTAMP WITHOUT TIME ZONE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS section_summaries (
+        id UUID PRIMARY KEY,
+        project_id UUID REFERENCES projects (id),
+        section_index INTEGER NOT NULL,
+        chunk_start INTEGER,
+        chunk_end INTEGER,
+        page_start INTEGER,
+        page_end INTEGER,
+        summary TEXT,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        CONSTRAINT uq_section_summaries_project_section UNIQUE (project_id, section_index)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS collab_requests (
+        id UUID PRIMARY KEY,
+        sender_id VARCHAR REFERENCES users (id),
+        receiver_id VARCHAR REFERENCES users (id),
+        project_id UUID REFERENCES projects (id),
+        status VARCHAR,
+        created_at TIMESTAMP WITHOUT TIME ZONE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chat_messages (
+        id UUID PRIMARY KEY,
+        project_id UUID REFERENCES projects (id),
+        sender_id VARCHAR REFERENCES users (id),
+        content TEXT,
+        is_ai BOOLEAN,
+        created_at TIMESTAMP WITHOUT TIME ZONE
+    )
+    """,
+
+    # 2. Columns added after the first release (no-ops on a fresh database)
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS page_number integer",
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS chunk_index integer",
+    "ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED",
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS centroid vector(768)",
+
+    # 3. Indexes
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+    "CREATE INDEX IF NOT EXISTS ix_projects_user_id ON projects (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_projects_centroid_hnsw ON projects "
+    "USING hnsw (centroid vector_cosine_ops) WITH (m = 16, ef_construction = 64)",
+    "CREATE INDEX IF NOT EXISTS ix_embeddings_project_id ON embeddings (project_id)",
+    "CREATE INDEX IF NOT EXISTS ix_embeddings_content_tsv ON embeddings USING gin (content_tsv)",
+    "CREATE INDEX IF NOT EXISTS ix_section_summaries_project_id ON section_summaries (project_id)",
+    "CREATE INDEX IF NOT EXISTS ix_chat_messages_project_created "
+    "ON chat_messages (project_id, created_at, id)",
+
+    # 4. Backfill centroids for papers processed before the column existed
+    "UPDATE projects p SET centroid = "
+    "(SELECT avg(e.vector) FROM embeddings e WHERE e.project_id = p.id) "
+    "WHERE p.centroid IS NULL AND p.is_processed",
+]
+
+TABLES = [
+    "chat_messages",
+    "collab_requests",
+    "section_summaries",
+    "ingestion_states",
+    "embeddings",
+    "project_files",
+    "projects",
+    "users",
+]
+
+
+def upgrade():
+    for stmt in UPGRADE:
+        op.execute(stmt)
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f"DROP TABLE IF EXISTS {table}")
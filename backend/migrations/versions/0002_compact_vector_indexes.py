@@ -0,0 +1,38 @@
+"""compact vector index for quantised search
+
+HNSW index over the half-precision or binary-quantised chunk vectors,
+used by the coarse pass when VECTOR_SEARCH_MODE is "halfvec" or
+"binary". Only the configured mode's index is built; with the default
+"exact" this builds nothing. After changing the mode later, run
+`python vector_index.py` to build the new index and drop the old one.
+
+Built CONCURRENTLY so ingestion and chat keep running while it builds;
+needs pgvector >= 0.7 (0.8 for iterative scans). Full vectors stay in
+the table for the exact re-rank, so the table does not shrink.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+from app.config import settings
+from app.retrieval import COMPACT_INDEXES, compact_index_statements
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for stmt in compact_index_statements(settings.VECTOR_SEARCH_MODE):
+            op.execute(stmt)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in COMPACT_INDEXES.values():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -1,13 +1,29 @@
+"""
+Synthetic data generator for demos and load testing.
+
+    python seed.py                                   # small demo dataset
+    python seed.py --users 10000 --projects 100000 --chunks 50
+
+Rows are streamed into Postgres with COPY in batches, so millions of
+embedding rows load in minutes. Embeddings are random 768-dim unit vectors
+clustered around a per-paper centre, which gives vector search realistic
+neighbourhoods without calling the embedding API.
+"""
+import argparse
 import asyncio
 import random
+import time
 import uuid
 from datetime import datetime, timedelta
+
+import asyncpg
+import numpy as np
 from faker import Faker
-from sqlalchemy import select
+from pgvector.asyncpg import register_vector
 
 # Ensure this runs from the /backend directory
-from app.database import AsyncSessionLocal
-from app.models import User, Project, ProjectFile, CollabRequest, ChatMessage
+from app.database import DATABASE_URL, check_schema
+from app.tasks import chunk_id
 
 fake = Faker()
 
@@ -16,108 +32,225 @@ DUMMY_PDF_DATA = b"%PDF-1.4\n1 0 obj\n<<\n/Type /Catalog\n/Pages 2 0 R\n>>\nendo
 
 TECH_TOPICS = ["AI", "Generative AI", "Blockchain", "Quantum Computing", "React", "Neural Networks", "Cybersecurity", "IoT", "Cloud Architecture", "Robotics"]
 
-async def seed_data():
+DIMENSIONS = 768
+CHUNKS_PER_PAGE = 3
+
+SEEDED_NOW = datetime(2025, 1, 1)
+
+# Faker is far too slow to call per row at this scale; sample from pools
+POOL_SIZE = 2000
+
+
+class Pools:
+    def __init__(self):
+        self.names = [fake.name() for _ in range(POOL_SIZE)]
+        self.phrases = [fake.catch_phrase() for _ in range(POOL_SIZE)]
+        self.paragraphs = [fake.paragraph(nb_sentences=8) for _ in range(POOL_SIZE)]
+        self.sentences = [fake.sentence() for _ in range(POOL_SIZE)]
+        # Chunk-sized text (~1000 chars, like the real splitter)
+        self.chunks = [" ".join(fake.paragraphs(nb=5))[:1000] for _ in range(POOL_SIZE)]
+
+
+class CopyBuffer:
+    """
+    Collects rows for one table and COPYs them in batches.
+    Parent buffers are flushed first so foreign keys always resolve.
+    """
+
+    def __init__(self, conn, table: str, columns: list[str], batch_size: int, parents: tuple = ()):
+        self.conn = conn
+        self.table = table
+        self.columns = columns
+        self.batch_size = batch_size
+        self.parents = parents
+        self.rows = []
+        self.total = 0
+
+    async def add(self, row: tuple):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.rows:
+            return
+        for parent in self.parents:
+            await parent.flush()
+        await self.conn.copy_records_to_table(self.table, records=self.rows, columns=self.columns)
+        self.total += len(self.rows)
+        self.rows = []
+
+
+def new_id() -> uuid.UUID:
+    # From the seeded RNG (not uuid4) so --seed reproduces the same ids;
+    # chunk ids derive from the project id, so they follow
+    return uuid.UUID(int=random.getrandbits(128), version=4)
+
+
+def unit_vectors(rng, centre, count: int, spread: float) -> np.ndarray:
+    vectors = centre + spread * rng.standard_normal((count, DIMENSIONS), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def seed_data(args):
     print("🌱 Starting Database Seed...")
-    
-    async with AsyncSessionLocal() as db:
-        
+    started = time.perf_counter()
+
+    # Tables must exist before COPY (run `alembic upgrade head` first)
+    await check_schema()
+
+    rng = np.random.default_rng(args.seed)
+    random.seed(args.seed)
+    Faker.seed(args.seed)
+    pools = Pools()
+
+    conn = await asyncpg.connect(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://"))
+    await register_vector(conn)
+    try:
+        batch = args.batch_size
+
         # 1. Create Fake Users
-        print("👤 Creating 10 Fake Users...")
-        users = []
-        for _ in range(10):
-            uid = f"user_{uuid.uuid4().hex[:8]}"
-            user = User(
-                id=uid,
-                email=fake.unique.email(),
-                name=fake.name(),
-                picture=f"https://api.dicebear.com/7.x/avataaars/svg?seed={uid}" # Random avatar image
-            )
-            db.add(user)
-            users.append(user)
-        
-        await db.commit()
-
-        # 2. Create Projects & Files
-        print("📄 Creating 20 Research Projects...")
-        projects = []
-        for _ in range(20):
-            owner = random.choice(users)
-            title = fake.catch_phrase() + " in " + random.choice(TECH_TOPICS)
-            
-            project = Project(
-                id=uuid.uuid4(),
-                user_id=owner.id,
-                title=title,
-                abstract=fake.paragraph(nb_sentences=8),
-                topics=random.sample(TECH_TOPICS, k=3),
-                created_at=fake.date_time_between(start_date="-1y", end_date="now"),
-                views_count=random.randint(50, 5000), # Random high views for "Trending"
-                is_processed=True
-            )
-            db.add(project)
-            projects.append(project)
+        print(f"👤 Creating {args.users} Fake Users...")
+        users = CopyBuffer(conn, "users", ["id", "email", "name", "picture"], batch)
+        user_ids = []
+        for _ in range(args.users):
+            uid = f"user_{new_id().hex[:12]}"
+            user_ids.append(uid)
+            await users.add((
+                uid,
+                f"{uid}@example.org",
+                random.choice(pools.names),
+                f"https://api.dicebear.com/7.x/avataaars/svg?seed={uid}"  # Random avatar image
+            ))
+        await users.flush()
+
+        # 2. Create Projects, Files and Embeddings
+        print(f"📄 Creating {args.projects} Research Projects ({args.chunks} chunks each)...")
+        projects = CopyBuffer(
+            conn, "projects",
+            ["id", "user_id", "title", "abstract", "topics", "created_at", "is_processed", "views_count", "centroid"],
+            batch,
+        )
+        files = CopyBuffer(
+            conn, "project_files",
+            ["id", "project_id", "filename", "content_type", "data", "created_at"],
+            batch, parents=(projects,),
+        )
+        embeddings = CopyBuffer(
+            conn, "embeddings",
+            ["id", "project_id", "content", "page_number", "chunk_index", "vector"],
+            batch, parents=(projects,),
+        )
+        collabs = CopyBuffer(
+            conn, "collab_requests",
+            ["id", "sender_id", "receiver_id", "project_id", "status", "created_at"],
+            batch, parents=(projects,),
+        )
+        messages = CopyBuffer(
+            conn, "chat_messages",
+            ["id", "project_id", "sender_id", "content", "is_ai", "created_at"],
+            batch, parents=(projects,),
+        )
+
+        # A fixed clock too when seeded, so timestamps reproduce as well
+        now = SEEDED_NOW if args.seed is not None else datetime.utcnow()
+        for i in range(args.projects):
+            project_id = new_id()
+            owner = random.choice(user_ids)
+            title = random.choice(pools.phrases) + " in " + random.choice(TECH_TOPICS)
+            created_at = now - timedelta(seconds=random.randint(0, 365 * 24 * 3600))
+
+            centroid = None
+            if args.chunks:
+                centre = rng.standard_normal(DIMENSIONS, dtype=np.float32)
+                vectors = unit_vectors(rng, centre / np.linalg.norm(centre), args.chunks, args.spread)
+                centroid = vectors.mean(axis=0)
+
+            await projects.add((
+                project_id,
+                owner,
+                title,
+                random.choice(pools.paragraphs),
+                random.sample(TECH_TOPICS, k=3),
+                created_at,
+                True,
+                int(rng.pareto(1.5) * 100),  # Long-tailed views for "Trending"
+                centroid,
+            ))
 
             # Add Dummy PDF File
-            p_file = ProjectFile(
-                id=uuid.uuid4(),
-                project_id=project.id,
-                filename=f"{title.replace(' ', '_')[:20]}.pdf",
-                content_type="application/pdf",
-                data=DUMMY_PDF_DATA
-            )
-            db.add(p_file)
-
-        await db.commit()
-
-        # 3. Create Collab Requests
-        print("🤝 Simulating Collaborations...")
-        accepted_collabs = []
-        
-        for proj in projects:
-            if random.random() > 0.4: # 60% chance of having requests
-                sender = random.choice([u for u in users if u.id != proj.user_id])
+            await files.add((
+                new_id(),
+                project_id,
+                f"{title.replace(' ', '_')[:20]}.pdf",
+                "application/pdf",
+                DUMMY_PDF_DATA,
+                created_at,
+            ))
+
+            for chunk_index in range(args.chunks):
+                await embeddings.add((
+                    chunk_id(project_id, chunk_index),
+                    project_id,
+                    random.choice(pools.chunks),
+                    chunk_index // CHUNKS_PER_PAGE + 1,
+                    chunk_index,
+                    vectors[chunk_index],
+                ))
+
+            # 3. Collab Requests
+            if len(user_ids) > 1 and random.random() < args.collab_rate:
+                sender = random.choice(user_ids)
+                while sender == owner:
+                    sender = random.choice(user_ids)
                 status = random.choice(["PENDING", "ACCEPTED", "REJECTED"])
-                
-                req = CollabRequest(
-                    sender_id=sender.id,
-                    receiver_id=proj.user_id,
-                    project_id=proj.id,
-                    status=status
-                )
-                db.add(req)
-                
+                await collabs.add((new_id(), sender, owner, project_id, status, created_at))
+
+                # 4. Chat History for accepted collaborations
                 if status == "ACCEPTED":
-                    accepted_collabs.append((proj, sender, proj.user))
-
-        await db.commit()
-
-        # 4. Create Chat Messages
-        print("💬 Generating Chat History...")
-        for proj, collaborator, owner in accepted_collabs:
-            # Generate a conversation
-            for _ in range(random.randint(2, 6)):
-                sender = random.choice([collaborator, owner])
-                msg = ChatMessage(
-                    project_id=proj.id,
-                    sender_id=sender.id,
-                    content=fake.sentence(),
-                    is_ai=False,
-                    created_at=datetime.utcnow()
-                )
-                db.add(msg)
-            
-            # Add an AI message occasionally
-            if random.random() > 0.5:
-                db.add(ChatMessage(
-                    project_id=proj.id,
-                    sender_id=owner.id, 
-                    content=f"Based on the analysis of '{proj.title}', the methodology appears sound...",
-                    is_ai=True,
-                    created_at=datetime.utcnow()
-                ))
+                    sent_at = created_at
+                    for _ in range(args.messages):
+                        sent_at += timedelta(seconds=random.randint(5, 3600))
+                        is_ai = random.random() < 0.1
+                        content = (
+                            f"Based on the analysis of '{title}', the methodology appears sound..."
+                            if is_ai else random.choice(pools.sentences)
+                        )
+                        await messages.add((
+                            new_id(), project_id, random.choice([sender, owner]), content, is_ai, sent_at
+                        ))
+
+            if (i + 1) % 1000 == 0:
+                print(f"   ... {i + 1} projects, {embeddings.total + len(embeddings.rows)} chunks")
+
+        for buffer in (projects, files, embeddings, collabs, messages):
+            await buffer.flush()
+
+        print("🧮 Analyzing tables...")
+        for table in ("users", "projects", "project_files", "embeddings", "collab_requests", "chat_messages"):
+            await conn.execute(f"ANALYZE {table}")
+
+        elapsed = time.perf_counter() - started
+        print(
+            f"🎉 SEEDING COMPLETE in {elapsed:.1f}s: {users.total} users, {projects.total} projects, "
+            f"{embeddings.total} chunks, {collabs.total} collab requests, {messages.total} messages."
+        )
+    finally:
+        await conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=20, help="embedding rows per project")
+    parser.add_argument("--messages", type=int, default=4, help="chat messages per accepted collaboration")
+    parser.add_argument("--collab-rate", type=float, default=0.6, help="share of projects with a collab request")
+    parser.add_argument("--spread", type=float, default=0.05, help="how far chunks scatter around their paper's centre")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per COPY")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible datasets")
+    return parser.parse_args()
 
-        await db.commit()
-        print("🎉 SEEDING COMPLETE! Your app is now populated.")
 
 if __name__ == "__main__":
-    asyncio.run(seed_data())
\ No newline at end of file
+    asyncio.run(seed_data(parse_args()))
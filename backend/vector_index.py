@@ -0,0 +1,40 @@
+"""
+Build the compact vector index for VECTOR_SEARCH_MODE and drop the others.
+
+Migration 0002 does this for the mode configured when it ran; run this
+after changing the mode (before restarting the API with the new setting):
+
+    VECTOR_SEARCH_MODE=binary python vector_index.py
+    python vector_index.py --mode exact        # drop all compact indexes
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine
+from app.retrieval import VECTOR_SEARCH_MODES, compact_index_statements
+
+
+async def sync_indexes(mode: str):
+    # CONCURRENTLY: no transaction, and no lock that would stop ingestion
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for stmt in compact_index_statements(mode):
+            print(f"🏗  {stmt}")
+            started = time.perf_counter()
+            await conn.execute(text(stmt))
+            print(f"   done in {time.perf_counter() - started:.1f}s")
+    await engine.dispose()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=VECTOR_SEARCH_MODES, default=settings.VECTOR_SEARCH_MODE)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(sync_indexes(parse_args().mode))